@@ -0,0 +1,41 @@
+"""
+Measure showing the stack with `where` and moving up through it, in a shallow and a deep recursion.
+Run with `python -m benchmarks.deep_stack`.
+"""
+import sys
+from time import perf_counter
+
+from IPython.terminal.debugger import TerminalPdb
+
+from .watchpoints import debugger_on_pty
+
+DEPTHS = (10, 3000)
+REPEATS = 10
+
+
+def recurse(debugger, depth, commands):
+    if depth:
+        return recurse(debugger, depth - 1, commands)
+    debugger.cmdqueue = [*commands, 'c']
+    start = perf_counter()
+    debugger.set_trace()
+    return perf_counter() - start
+
+
+def time_command(debugger, depth, command):
+    baseline = recurse(debugger, depth, [])
+    return (recurse(debugger, depth, [command] * REPEATS) - baseline) / REPEATS
+
+
+def main():
+    sys.setrecursionlimit(max(DEPTHS) + 1000)
+    with debugger_on_pty() as debugger:
+        debugger.do_every_frame = lambda arg: TerminalPdb.print_stack_trace(debugger)
+        for depth in DEPTHS:
+            timings = ', '.join(f'{command} {time_command(debugger, depth, command) * 1000:.1f}ms'
+                                for command in ('where', 'where all', 'every_frame', 'up 100'))
+            print(f'{depth:>5} frames: {timings}')
+
+
+if __name__ == '__main__':
+    main()
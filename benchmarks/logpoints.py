@@ -0,0 +1,51 @@
+"""
+Measure the overhead of a logpoint on a hot loop, and on a program that doesn't run the logged line.
+Run with `python -m benchmarks.logpoints`.
+"""
+from time import perf_counter
+
+from .watchpoints import debugger_on_pty, workload
+
+ITERATIONS = 100_000
+
+
+def hot_loop():
+    total = 0
+    for i in range(ITERATIONS):
+        total += i
+    return total
+
+
+LOGGED_LINE = hot_loop.__code__.co_firstlineno + 3
+
+
+def timed(func):
+    start = perf_counter()
+    func()
+    return perf_counter() - start
+
+
+def run_with_logpoint(debugger):
+    debugger.cmdqueue = [f'logpoint {LOGGED_LINE} i, total', 'c']
+    debugger.set_trace()
+    elapsed = timed(hot_loop), timed(workload)
+    debugger.cmdqueue = ['unlogpoint', 'c']
+    debugger.set_trace()
+    return elapsed
+
+
+def main():
+    print(f'No debugger:                  hot loop {timed(hot_loop):.3f}s, other code {timed(workload):.3f}s')
+    with debugger_on_pty() as debugger:
+        monitor = debugger.logpoint_monitor
+        if monitor is not None:
+            hot, other = run_with_logpoint(debugger)
+            print(f'Logpoint (sys.monitoring):    hot loop {hot:.3f}s, other code {other:.3f}s')
+        debugger.logpoint_monitor = None
+        hot, other = run_with_logpoint(debugger)
+        print(f'Logpoint (trace function):    hot loop {hot:.3f}s, other code {other:.3f}s')
+        debugger.logpoint_monitor = monitor
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Measure restarting a script from the debugger against starting it in a new interpreter.
+Run with `python -m benchmarks.restart`.
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+from madbg import run_with_debugging
+from .watchpoints import debugger_on_pty
+
+RESTARTS = 5
+SCRIPT = '''
+from benchmarks import restart  # Outside the script's directory, so it is kept across restarts
+# Stand for heavy dependencies
+import IPython
+import email.mime.multipart
+import http.server
+import pygments.lexers.python
+import xml.dom.minidom
+import helper  # Imported again on every restart
+
+restart.run_ended()
+'''
+
+run_ends = []
+restarts_left = 0
+
+
+def run_ended():
+    global restarts_left
+    run_ends.append(perf_counter())
+    if restarts_left:
+        restarts_left -= 1
+        # Fail, so the debugger stops and restarts
+        raise RuntimeError()
+
+
+def cold_start(script_path: Path) -> float:
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).parent.parent))
+
+    def run(*args):
+        start = perf_counter()
+        subprocess.run([sys.executable, *args], check=True, env=env)
+        return perf_counter() - start
+
+    return min(run(str(script_path)) for _ in range(3)) - min(run('-c', 'pass') for _ in range(3))
+
+
+def restart(script_path: Path) -> float:
+    global restarts_left
+    restarts_left = RESTARTS
+    with debugger_on_pty() as debugger:
+        debugger.cmdqueue = ['restart'] * RESTARTS
+        run_with_debugging(str(script_path), debugger=debugger)
+    return (run_ends[-1] - run_ends[0]) / RESTARTS
+
+
+def main():
+    with tempfile.TemporaryDirectory() as script_dir:
+        script_path = Path(script_dir) / 'script.py'
+        script_path.write_text(SCRIPT)
+        (Path(script_dir) / 'helper.py').write_text('')
+        print(f'Cold start: {cold_start(script_path):.3f}s')
+        print(f'Restart:    {restart(script_path):.3f}s')
+
+
+if __name__ == '__main__':
+    # The script imports this module, so have it find this one instead of importing it again
+    sys.modules[__spec__.name] = sys.modules[__name__]
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure stepping over a heavy call with `next`, past a loop with `until`, and out of a frame with `return`.
+Run with `python -m benchmarks.stepping`.
+"""
+import sys
+from time import perf_counter
+
+from .watchpoints import debugger_on_pty, fib
+
+ITERATIONS = 100_000
+
+
+def workload():
+    return fib(20)
+
+
+def loop():
+    total = 0
+    for i in range(ITERATIONS):
+        total += i
+    return total
+
+
+def never_called():
+    pass
+
+
+def step_over(debugger):
+    debugger.cmdqueue = ['n', 'c']
+    start = perf_counter()
+    debugger.set_trace()
+    workload()
+    return perf_counter() - start
+
+
+def run_until(debugger):
+    debugger.cmdqueue = [f'until {sys._getframe().f_lineno + 5}', 'c']
+    start = perf_counter()
+    debugger.set_trace()
+    for i in range(ITERATIONS):
+        i += 1
+    return perf_counter() - start
+
+
+def step_out(debugger):
+    def stepped():
+        debugger.set_trace()
+        workload()
+        loop()
+
+    debugger.cmdqueue = ['r', 'c']
+    start = perf_counter()
+    stepped()
+    return perf_counter() - start
+
+
+def run_step(debugger, step):
+    # Continuing with breakpoints keeps tracing, and set_trace shouldn't be traced itself
+    sys.settrace(None)
+    return step(debugger)
+
+
+def run_all(debugger, title):
+    print(f'{title:<44}next {run_step(debugger, step_over):.3f}s, until {run_step(debugger, run_until):.3f}s, '
+          f'return {run_step(debugger, step_out):.3f}s')
+
+
+def main():
+    with debugger_on_pty() as debugger:
+        monitor = debugger.step_monitor
+        if monitor is not None:
+            run_all(debugger, 'sys.monitoring:')
+        debugger.step_monitor = None
+        run_all(debugger, 'Trace function:')
+        # Any breakpoint makes stepping fall back to tracing everything
+        debugger.set_break(__file__, never_called.__code__.co_firstlineno + 1)
+        run_all(debugger, 'Tracing everything (a breakpoint is set):')
+        sys.settrace(None)
+        debugger.clear_all_breaks()
+        debugger.step_monitor = monitor
+
+
+if __name__ == '__main__':
+    main()
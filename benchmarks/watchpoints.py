@@ -0,0 +1,83 @@
+"""
+Measure the overhead of a watchpoint on a program that doesn't touch the watched value.
+Run with `python -m benchmarks.watchpoints`.
+"""
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+from madbg.debugger import RemoteIPythonDebugger
+from madbg.tty_utils import PTY
+
+
+class State:
+    value = 0
+
+
+def fib(n):
+    return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+
+def workload():
+    for _ in range(20):
+        fib(18)
+
+
+@contextmanager
+def debugger_on_pty():
+    with PTY.open() as pty:
+        # Drain the debugger's output, nobody is reading it
+        drain_thread = threading.Thread(target=lambda: [None for _ in iter(lambda: os.read(pty.master_fd, 4096), b'')],
+                                        daemon=True)
+        drain_thread.start()
+        yield RemoteIPythonDebugger(os.fdopen(pty.slave_fd, 'r'), os.fdopen(pty.slave_fd, 'w'), 'dumb')
+
+
+def run_with_watchpoint(debugger):
+    state = State()
+    debugger.cmdqueue = ['watch state.value', 'c']
+    debugger.set_trace()
+    start = perf_counter()
+    workload()
+    elapsed = perf_counter() - start
+    debugger.cmdqueue = ['unwatch', 'c']
+    state.value = 1
+    return elapsed
+
+
+def run_with_line_tracing():
+    state = State()
+    value = state.value
+
+    def trace(frame, event, arg):
+        if state.value != value:
+            raise AssertionError()
+        return trace
+
+    sys.settrace(trace)
+    start = perf_counter()
+    workload()
+    elapsed = perf_counter() - start
+    sys.settrace(None)
+    return elapsed
+
+
+def main():
+    start = perf_counter()
+    workload()
+    baseline = perf_counter() - start
+    print(f'No debugger:                       {baseline:.3f}s')
+    print(f'Checking on every line:            {run_with_line_tracing():.3f}s')
+    with debugger_on_pty() as debugger:
+        monitor = debugger.watchpoint_monitor
+        if monitor is not None:
+            print(f'Watchpoint (sys.monitoring):       {run_with_watchpoint(debugger):.3f}s')
+        debugger.watchpoint_monitor = None
+        print(f'Watchpoint (trace function):       {run_with_watchpoint(debugger):.3f}s')
+        debugger.watchpoint_monitor = monitor
+
+
+if __name__ == '__main__':
+    main()
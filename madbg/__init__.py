@@ -1,2 +1,4 @@
-from .api import set_trace, set_trace_on_connect, post_mortem, run_with_debugging, attach_to_process
+from .api import set_trace, set_trace_on_connect, serve, post_mortem, run_with_debugging, attach_to_process
 from .client import connect_to_debugger
+from .options import SessionOptions
+from .metrics import stats, dump_stats
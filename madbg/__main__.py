@@ -1,9 +1,13 @@
+import asyncio
 import sys
-from click import ClickException, group, argument, option, pass_context
+from click import ClickException, FloatRange, group, argument, option, pass_context, echo
 
 from madbg.client import connect_to_debugger
-from madbg.consts import DEFAULT_IP, DEFAULT_PORT, DEFAULT_CONNECT_TIMEOUT
-from madbg import run_with_debugging, attach_to_process
+from madbg.consts import DEFAULT_IP, DEFAULT_PORT, DEFAULT_CONNECT_TIMEOUT, STDOUT_FILENO, DEFAULT_BROKER_PORT
+from madbg.broker import Broker
+from madbg.recording import SessionRecording
+from madbg.discovery import list_debuggers
+from madbg import run_with_debugging, attach_to_process, SessionOptions
 
 port_argument = argument('port', type=int, default=DEFAULT_PORT)
 connect_timeout_option = option('-t', '--timeout', type=float, default=DEFAULT_CONNECT_TIMEOUT, show_default=True,
@@ -19,9 +23,15 @@ def cli():
 @argument('ip', type=str, default=DEFAULT_IP)
 @port_argument
 @connect_timeout_option
-def connect(ip, port, timeout):
+@option('-o', '--observe', is_flag=True, flag_value=True, default=False,
+        help='Watch a session driven by another client, without sending it input')
+@option('-e', '--predict-echo', is_flag=True, flag_value=True, default=False,
+        help='Show typed characters before the debugger echoes them, useful on slow connections')
+@option('-T', '--target', type=int, default=None,
+        help='When connecting to a broker, the pid of the process to debug, instead of picking it from a menu')
+def connect(ip, port, timeout, observe, predict_echo, target):
     try:
-        connect_to_debugger(ip, port, timeout=timeout)
+        connect_to_debugger(ip, port, timeout=timeout, observe=observe, predict_echo=predict_echo, target=target)
     except (ConnectionRefusedError, TimeoutError):
         raise ClickException('Connection refused - did you use the right port?')
 
@@ -44,12 +54,69 @@ def attach(pid, port, timeout):
 @option('-n', '--no-post-mortem', is_flag=True, flag_value=True, default=False)
 @option('-s', '--use-set-trace', is_flag=True, flag_value=True, default=False)
 @option('-m', '--run-as-module', is_flag=True, flag_value=True, default=False, help='Works the same as python -m')
+@option('-w', '--max-observers', type=int, default=0, show_default=True,
+        help='How many read-only observers may watch the session')
+@option('-r', '--record', type=str, default=None, help='Record the session to the given file')
+@option('-R', '--reload', 'reload_modules', type=str, multiple=True,
+        help='A module or package to import again on restart, instead of the ones in the directory of the script. '
+             'Can be given multiple times')
 @argument('py_file', type=str, required=True)
 @pass_context
-def run(context, bind_ip, port, run_as_module, py_file, no_post_mortem, use_set_trace):
+def run(context, bind_ip, port, run_as_module, py_file, no_post_mortem, use_set_trace, max_observers, record,
+        reload_modules):
     argv = [sys.argv[0], *context.args]
     run_with_debugging(py_file, run_as_module=run_as_module, argv=argv, use_post_mortem=not no_post_mortem,
-                       use_set_trace=use_set_trace, ip=bind_ip, port=port)
+                       use_set_trace=use_set_trace, ip=bind_ip, port=port,
+                       options=SessionOptions(max_observers=max_observers, record_path=record),
+                       reload_modules=reload_modules or None)
+
+
+@cli.command(name='list', help='List the processes waiting for a debugger client, set up by set_trace_on_connect.')
+def list_command():
+    try:
+        debuggers = list_debuggers()
+    except PermissionError as e:
+        raise ClickException(str(e))
+    if not debuggers:
+        echo('No debuggers are waiting for a client')
+        return
+    echo(f'{"PID":>8} {"PPID":>8}  {"ADDRESS":<21}  COMMAND')
+    for debugger in debuggers:
+        address = f'{debugger["ip"]}:{debugger["port"]}'
+        echo(f'{debugger["pid"]:>8} {debugger["ppid"]:>8}  {address:<21}  {" ".join(debugger["argv"])}')
+
+
+@cli.command(help='Relay debugger clients to the processes on this host, '
+                  'so one port covers all the processes waiting for a client.')
+@argument('ip', type=str, default=DEFAULT_IP)
+@argument('port', type=int, default=DEFAULT_BROKER_PORT)
+@connect_timeout_option
+@option('-a', '--allow-attach', is_flag=True, flag_value=True, default=False,
+        help='Attach to processes that are not waiting for a debugger when a client names them, like with attach. '
+             'Any client of the broker could then debug any process the broker can attach to.')
+def broker(ip, port, timeout, allow_attach):
+    try:
+        asyncio.run(Broker(ip, port, connect_timeout=timeout, allow_attach=allow_attach).serve())
+    except OSError as e:
+        raise ClickException(str(e))
+    except KeyboardInterrupt:
+        pass
+
+
+@cli.command(help='Replay a recorded debugging session.')
+@argument('recording_file', type=str)
+@option('-s', '--speed', type=FloatRange(min=0, min_open=True), default=1., show_default=True,
+        help='Playback speed multiplier')
+@option('-f', '--from', 'start', type=float, default=0., show_default=True,
+        help='Seconds into the recording to start from')
+@option('-i', '--max-idle', type=float, default=None, help='Shorten longer pauses to this many seconds')
+def replay(recording_file, speed, start, max_idle):
+    try:
+        SessionRecording(recording_file).replay(STDOUT_FILENO, speed=speed, start=start, max_idle=max_idle)
+    except (OSError, ValueError) as e:
+        raise ClickException(str(e))
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == '__main__':
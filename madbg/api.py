@@ -1,12 +1,16 @@
+import asyncio
+import errno
 import os
 import re
 import signal
+import socket
 import sys
 from select import select
 from traceback import format_exc
-from contextlib import nullcontext
+from contextlib import closing, nullcontext, ExitStack
 from inspect import currentframe
 from pdb import Restart
+from typing import NamedTuple, Optional, Sequence, Tuple
 from hypno import inject_py
 from fcntl import fcntl, F_GETFL, F_SETFL, F_SETOWN
 from os import O_ASYNC, getpid
@@ -14,8 +18,11 @@ from os import O_ASYNC, getpid
 from .client import connect_to_debugger
 from .tty_utils import print_to_ctty, set_handler
 from .utils import use_context
-from .consts import DEFAULT_IP, DEFAULT_PORT, DEFAULT_CONNECT_TIMEOUT
+from .consts import DEFAULT_IP, DEFAULT_PORT, DEFAULT_CONNECT_TIMEOUT, FORK_PORT_RANGE
 from .debugger import RemoteIPythonDebugger
+from .discovery import register_debugger
+from .options import SessionOptions
+from .restart import get_script_dir, unload_modules
 
 DEBUGGER_CONNECTED_SIGNAL = signal.SIGUSR1
 
@@ -35,30 +42,91 @@ def attach_to_process(pid: int, port=DEFAULT_PORT, connect_timeout=DEFAULT_CONNE
     connect_to_debugger(ip, port, timeout=connect_timeout)
 
 
-def set_trace(frame=None, ip=DEFAULT_IP, port=DEFAULT_PORT):
+def set_trace(frame=None, ip=DEFAULT_IP, port=DEFAULT_PORT, options=SessionOptions()):
     if frame is None:
         frame = currentframe().f_back
-    debugger, exit_stack = use_context(RemoteIPythonDebugger.connect_and_start(ip, port))
+    debugger, exit_stack = use_context(RemoteIPythonDebugger.connect_and_start(ip, port, options))
     debugger.set_trace(frame, done_callback=exit_stack.close)
 
 
-def set_trace_on_connect(ip=DEFAULT_IP, port=DEFAULT_PORT):
+class _Listener(NamedTuple):
+    ip: str
+    port: int
+    options: SessionOptions
+    exit_stacks: Tuple[ExitStack, ...]
+
+
+# The last listener set up by set_trace_on_connect with follow_forks, which forked children replace with their own
+_followed_listener: Optional[_Listener] = None
+
+
+def _get_free_server_socket(ip: str, first_port: int) -> Tuple[socket.socket, ExitStack, int]:
+    for port in range(first_port, min(first_port + FORK_PORT_RANGE, 0x10000)):
+        # Only the socket that binds is registered to be closed at exit, not every probe
+        server_socket = socket.socket()
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, True)
+        try:
+            server_socket.bind((ip, port))
+        except OSError as e:
+            server_socket.close()
+            if e.errno != errno.EADDRINUSE:
+                raise
+        else:
+            server_socket, server_exit_stack = use_context(closing(server_socket))
+            return server_socket, server_exit_stack, port
+    raise OSError(errno.EADDRINUSE, f'No free port in {first_port}-{first_port + FORK_PORT_RANGE - 1}')
+
+
+def _set_trace_on_connect_in_forked_child():
+    """
+    A forked child inherits the parent's listening socket, whose SIGIO is sent to the parent, and its SIGIO handler.
+    Drop both, and listen on a port of our own.
+    """
+    listener = _followed_listener
+    if listener is None:
+        return
+    for exit_stack in listener.exit_stacks:
+        exit_stack.close()
+    # A session of the parent can't go on in the child
+    RemoteIPythonDebugger._set_current_instance(None)
+    set_trace_on_connect(listener.ip, listener.port + 1, listener.options, follow_forks=True)
+
+
+def set_trace_on_connect(ip=DEFAULT_IP, port=DEFAULT_PORT, options=SessionOptions(), follow_forks=False):
     """
     Set up a debugger in another thread, which will signal the main thread when it receives a connection.
     Also set up a signal handler that will call set_trace when the signal is received.
+
+    The process is registered to be listed by `madbg list`, and reached through `madbg broker`.
+
+    :param follow_forks: Also set up the debugger in processes forked from this one, like multiprocessing workers,
+                         each on the first free port after its parent's. If the port is taken,
+                         the first free port after it is used.
     """
-    server_socket, server_exit_stack = use_context(RemoteIPythonDebugger.get_server_socket(ip, port))
+    global _followed_listener
+    if follow_forks:
+        server_socket, server_exit_stack, port = _get_free_server_socket(ip, port)
+    else:
+        server_socket, server_exit_stack = use_context(RemoteIPythonDebugger.get_server_socket(ip, port))
 
     def sigio_handler(signum, frame):
         if select([server_socket], [], [], 0)[0]:
             handler_exit_stack.close()
             sock, _ = server_socket.accept()
-            server_exit_stack.close()
-            debugger, debugger_exit_stack = use_context(RemoteIPythonDebugger.start_from_new_connection(sock))
+            observers_socket = None
+            if options.max_observers:
+                # Keep listening for observers, but without signaling us on connections
+                observers_socket = server_socket
+                fcntl(server_fd, F_SETFL, fcntl(server_fd, F_GETFL, 0) & ~O_ASYNC)
+            else:
+                server_exit_stack.close()
+            debugger, debugger_exit_stack = use_context(
+                RemoteIPythonDebugger.start_from_new_connection(sock, options, observers_socket))
 
             def on_trace_done():
                 debugger_exit_stack.close()
-                set_trace_on_connect(ip, port)
+                server_exit_stack.close()
+                set_trace_on_connect(ip, port, options, follow_forks)
 
             debugger.set_trace(frame, done_callback=on_trace_done)
         elif not isinstance(old_handler, signal.Handlers):
@@ -70,37 +138,93 @@ def set_trace_on_connect(ip=DEFAULT_IP, port=DEFAULT_PORT):
     fcntl(server_fd, F_SETFL, fcntl(server_fd, F_GETFL, 0) | O_ASYNC)
     server_socket.listen(1)
     print_to_ctty(f'Listening for debugger client on {ip}:{port}')
+    if follow_forks:
+        if _followed_listener is None:
+            os.register_at_fork(after_in_child=_set_trace_on_connect_in_forked_child)
+        _followed_listener = _Listener(ip, port, options, (handler_exit_stack, server_exit_stack))
+    try:
+        register_debugger(ip, port)
+    except PermissionError as e:
+        print_to_ctty(f'Not listing this process in `madbg list`: {e}')
 
 
-def post_mortem(traceback=None, ip=DEFAULT_IP, port=DEFAULT_PORT):
+async def serve(ip=DEFAULT_IP, port=DEFAULT_PORT, options=SessionOptions()):
+    """
+    Serve debugger clients from the running asyncio loop, an alternative to set_trace_on_connect for asyncio programs,
+    that uses no signals and no threads until a client connects.
+    Each client stops the loop's thread in a debugger, in this coroutine, from where the loop's tasks can be inspected.
+    The next client is accepted once the session ends. Runs until cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    with RemoteIPythonDebugger.get_server_socket(ip, port) as server_socket:
+        server_socket.listen(1)
+        server_socket.setblocking(False)
+        print_to_ctty(f'Listening for debugger client on {ip}:{port}')
+        while True:
+            sock, _ = await loop.sock_accept(server_socket)
+            sock.setblocking(True)
+            observers_socket = server_socket if options.max_observers else None
+            with ExitStack() as session_exit_stack:
+                debugger = session_exit_stack.enter_context(
+                    RemoteIPythonDebugger.start_from_new_connection(sock, options, observers_socket))
+                session_done = loop.create_future()
+
+                def on_trace_done():
+                    if not session_done.done():
+                        session_done.set_result(None)
+
+                debugger.set_trace(currentframe(), done_callback=on_trace_done)
+                await session_done
+
+
+def post_mortem(traceback=None, ip=DEFAULT_IP, port=DEFAULT_PORT, options=SessionOptions()):
     traceback = traceback or sys.exc_info()[2] or sys.last_traceback
-    with RemoteIPythonDebugger.connect_and_start(ip, port) as debugger:
+    with RemoteIPythonDebugger.connect_and_start(ip, port, options) as debugger:
         debugger.post_mortem(traceback)
 
 
-def run_with_debugging(python_file, run_as_module=False, argv=(), use_post_mortem=True, use_set_trace=False,
-                       ip=DEFAULT_IP, port=DEFAULT_PORT, debugger=None):
-    argv = [python_file, *argv]
-    with RemoteIPythonDebugger.connect_and_start(ip, port) if debugger is None else nullcontext(debugger) as debugger:
-        try:
-            debugger.run_py(python_file, run_as_module, argv, set_trace=use_set_trace)
-        except Restart:
-            print("Restarting", python_file, "with arguments:", file=debugger.stdout)
-            print("\t" + " ".join(argv), file=debugger.stdout)
-            return run_with_debugging(python_file, run_as_module=run_as_module, argv=argv,
-                                      use_post_mortem=use_post_mortem, use_set_trace=use_set_trace,
-                                      ip=ip, port=port, debugger=debugger)
-        except SystemExit as e:
-            print(f"The program exited via sys.exit(). Exit status: {e.code}", end=' ', file=debugger.stdout)
-        except SyntaxError:
-            raise
-        except:
-            if use_post_mortem:
-                print(format_exc(), file=debugger.stdout)
-                debugger.post_mortem(sys.exc_info()[2])
-            raise
-        else:
-            print(f'{python_file} finished running successfully', file=debugger.stdout)
+def _run_with_debugging_once(debugger, python_file, run_as_module, argv, use_post_mortem, use_set_trace):
+    try:
+        debugger.run_py(python_file, run_as_module, argv, set_trace=use_set_trace)
+    except SystemExit as e:
+        print(f"The program exited via sys.exit(). Exit status: {e.code}", end=' ', file=debugger.stdout)
+    except (SyntaxError, Restart):
+        raise
+    except:
+        if use_post_mortem:
+            print(format_exc(), file=debugger.stdout)
+            debugger.post_mortem(sys.exc_info()[2])
+        raise
+    else:
+        print(f'{python_file} finished running successfully', file=debugger.stdout)
+
 
+def run_with_debugging(python_file, run_as_module=False, argv=(), use_post_mortem=True, use_set_trace=False,
+                       ip=DEFAULT_IP, port=DEFAULT_PORT, debugger=None, options=SessionOptions(),
+                       reload_modules: Optional[Sequence[str]] = None):
+    """
+    Run a python file or module with a debugger, started on an exception or from its first line.
+    When restarted from the debugger, it runs again in the same process, keeping installed and standard library
+    modules imported, and importing again only the modules under the directory of the script.
 
-__all__ = ['attach_to_process', 'set_trace', 'set_trace_on_connect', 'post_mortem', 'run_with_debugging']
+    :param reload_modules: Names of modules or packages to import again on restart,
+                           instead of the ones under the directory of the script.
+    """
+    argv = [python_file, *argv]
+    with RemoteIPythonDebugger.connect_and_start(ip, port, options) if debugger is None else nullcontext(debugger) \
+            as debugger:
+        while True:
+            try:
+                _run_with_debugging_once(debugger, python_file, run_as_module, argv, use_post_mortem, use_set_trace)
+                return
+            except Restart:
+                print("Restarting", python_file, "with arguments:", file=debugger.stdout)
+                print("\t" + " ".join(argv), file=debugger.stdout)
+                if reload_modules is None:
+                    script_dir = get_script_dir(python_file, run_as_module)
+                    unload_modules(dirs=() if script_dir is None else (script_dir,))
+                else:
+                    unload_modules(names=reload_modules)
+
+
+__all__ = ['attach_to_process', 'set_trace', 'set_trace_on_connect', 'serve', 'post_mortem', 'run_with_debugging']
@@ -0,0 +1,161 @@
+import asyncio
+import socket
+from typing import List, Optional, Tuple
+
+from .api import _inject_set_trace
+from .communication import READ_SIZE, pack_message, read_message
+from .consts import DEFAULT_CONNECT_TIMEOUT
+from .discovery import list_debuggers
+
+LOCAL_IP = '127.0.0.1'
+# Control characters a client in raw mode sends while picking a target
+BACKSPACES = (b'\x7f', b'\b')
+ABORTS = (b'\x03', b'\x04')
+
+
+class TargetError(Exception):
+    pass
+
+
+def _find_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind((LOCAL_IP, 0))
+        return sock.getsockname()[1]
+
+
+async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            data = await reader.read(READ_SIZE)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+class Broker:
+    """
+    Relays debugger clients to the processes on this host that wait for one, so a single port covers all of them.
+    Processes armed with set_trace_on_connect register themselves in the registry listed by `madbg list`,
+    which the broker reads when a client connects. A client names its target's pid in its hello,
+    or picks one from a menu. Each session is two tasks copying between the sockets, so many can run at once.
+
+    :param allow_attach: Attach to processes that aren't registered, like with `madbg attach`, when a client
+        names them. As any client of the broker can then debug any process the broker can attach to,
+        this is off by default.
+    """
+
+    def __init__(self, ip: str, port: int, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 allow_attach: bool = False):
+        self.ip = ip
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.allow_attach = allow_attach
+
+    async def serve(self):
+        """ Relay clients until cancelled """
+        server = await asyncio.start_server(self._handle_client, self.ip, self.port)
+        async with server:
+            await server.serve_forever()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            term_data = await read_message(reader)
+            if not isinstance(term_data, dict):
+                raise ValueError('The terminal data must be a dict')
+            target = term_data.get('target')
+            if target is None:
+                target = await self._pick_target(reader, writer)
+            target_reader, target_writer = await self._connect_to_target(target)
+        except TargetError as e:
+            writer.write(f'{e}\r\n'.encode())
+            writer.close()
+            return
+        except (asyncio.IncompleteReadError, OSError, ValueError):
+            writer.close()
+            return
+        target_writer.write(pack_message(term_data))
+        await asyncio.gather(_pipe(reader, target_writer), _pipe(target_reader, writer))
+
+    def _format_menu(self, debuggers: List[dict]) -> str:
+        lines = ['Debuggers waiting for a client on this host:']
+        for i, debugger in enumerate(debuggers, 1):
+            lines.append(f'{i:>4}) {debugger["pid"]:>8}  {" ".join(debugger["argv"])}')
+        if self.allow_attach:
+            lines.append('Pick a number, or the pid of a process to attach to: ')
+        else:
+            lines.append('Pick a number, or the pid of a listed process: ')
+        return '\r\n'.join(lines)
+
+    async def _pick_target(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> int:
+        debuggers = list_debuggers()
+        writer.write(self._format_menu(debuggers).encode())
+        choice = await self._read_line(reader, writer)
+        try:
+            number = int(choice)
+        except ValueError:
+            raise TargetError(f'Not a number: {choice!r}')
+        if 1 <= number <= len(debuggers):
+            return debuggers[number - 1]['pid']
+        return number
+
+    @staticmethod
+    async def _read_line(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> str:
+        """ Read a line from a client in raw mode, echoing it """
+        line = bytearray()
+        while True:
+            char = await reader.readexactly(1)
+            if char in (b'\r', b'\n'):
+                writer.write(b'\r\n')
+                return line.decode(errors='replace').strip()
+            if char in ABORTS:
+                raise TargetError('Aborted')
+            if char in BACKSPACES:
+                if line:
+                    del line[-1]
+                    writer.write(b'\b \b')
+            elif char.isascii() and char.decode().isprintable():
+                line += char
+                writer.write(char)
+
+    async def _connect_to_target(self, pid: int) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        address = self._get_registered_address(pid)
+        if address is None:
+            if not self.allow_attach:
+                raise TargetError(f'Process {pid} is not waiting for a debugger client')
+            address = await self._attach(pid)
+        ip, port = address
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.connect_timeout
+        while True:
+            try:
+                return await asyncio.open_connection(ip, port)
+            except ConnectionRefusedError:
+                # An attached process may not be listening yet
+                if loop.time() > deadline:
+                    raise TargetError(f'Process {pid} refused the connection')
+                await asyncio.sleep(0.1)
+            except OSError as e:
+                raise TargetError(f'Could not connect to process {pid}: {e}')
+
+    @staticmethod
+    def _get_registered_address(pid: int) -> Optional[Tuple[str, int]]:
+        for debugger in list_debuggers():
+            if debugger['pid'] == pid:
+                ip = debugger['ip']
+                return (LOCAL_IP if ip in ('0.0.0.0', '') else ip), debugger['port']
+        return None
+
+    @staticmethod
+    async def _attach(pid: int) -> Tuple[str, int]:
+        port = _find_free_port()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, _inject_set_trace, pid, LOCAL_IP, port)
+        except Exception as e:
+            raise TargetError(f'Could not attach to process {pid}: {e}')
+        return LOCAL_IP, port
@@ -3,11 +3,14 @@ import socket
 import time
 import atexit
 from functools import partial
-from tty import setraw
+from tty import setraw, setcbreak
 from termios import tcdrain, tcgetattr, tcsetattr, TCSANOW
 from contextlib import contextmanager
+from typing import Optional
 
 from .communication import Piping, send_message
+from .prediction import EchoPredictor
+from .tty_utils import get_term_attrs
 from .consts import DEFAULT_IP, DEFAULT_PORT, STDIN_FILENO, STDOUT_FILENO, DEFAULT_CONNECT_TIMEOUT
 
 
@@ -33,12 +36,16 @@ def promise_cleanup(func, cleanup):
             cleanup()
 
 
-def prepare_terminal():
+def prepare_terminal(observe=False):
+    """
+    Put the terminal in raw mode, so all keys are sent to the debugger.
+    Observers don't send input, so they only disable echo and line buffering, and can still leave using Ctrl-C.
+    """
     tty_handle = get_tty_handle()
     old_tty_mode = tcgetattr(tty_handle)
-    set_raw = partial(setraw, tty_handle, TCSANOW)
+    set_mode = partial(setcbreak if observe else setraw, tty_handle, TCSANOW)
     cleanup = partial(tcsetattr, tty_handle, TCSANOW, old_tty_mode)
-    return promise_cleanup(set_raw, cleanup)
+    return promise_cleanup(set_mode, cleanup)
 
 
 @contextmanager
@@ -61,16 +68,37 @@ def connect_to_server(ip, port, timeout):
 
 
 def connect_to_debugger(ip=DEFAULT_IP, port=DEFAULT_PORT, timeout=DEFAULT_CONNECT_TIMEOUT,
-                        in_fd=STDIN_FILENO, out_fd=STDOUT_FILENO):
+                        in_fd=STDIN_FILENO, out_fd=STDOUT_FILENO, observe=False, predict_echo=False,
+                        target: Optional[int] = None):
+    """
+    :param observe: Watch a session another client is driving, without sending it any input.
+    :param predict_echo: Show typed characters before the debugger echoes them, for high latency connections.
+    :param target: When connecting to a broker, the pid of the process to debug.
+                   If not given, the broker lets you pick one.
+    """
     with connect_to_server(ip, port, timeout) as socket:
         tty_handle = get_tty_handle()
         term_size = os.get_terminal_size(tty_handle)
-        term_data = dict(term_attrs=tcgetattr(tty_handle),
+        term_data = dict(term_attrs=get_term_attrs(tty_handle),
                          # prompt toolkit will receive this string, and it can be 'unknown'
                          term_type=os.environ.get("TERM", "unknown"),
-                         term_size=(term_size.lines, term_size.columns))
+                         term_size=(term_size.lines, term_size.columns),
+                         observe=observe,
+                         target=target)
         send_message(socket, term_data)
-        with prepare_terminal():
+        with prepare_terminal(observe):
             socket_fd = socket.fileno()
-            Piping({in_fd: {socket_fd}, socket_fd: {out_fd}}).run()
+            pipe_dict = {socket_fd: {out_fd}}
+            if not observe:
+                pipe_dict[in_fd] = {socket_fd}
+            piping = Piping(pipe_dict)
+            if predict_echo and not observe:
+                predictor = EchoPredictor()
+                piping.add_tap(in_fd, lambda data: piping.write(out_fd, predictor.on_input(data)))
+                piping.set_filter(socket_fd, predictor.on_output)
+            try:
+                piping.run()
+            except KeyboardInterrupt:
+                if not observe:
+                    raise
             tcdrain(out_fd)
@@ -1,16 +1,15 @@
-import pickle
 import fcntl
+import json
 import os
 import struct
 from collections import defaultdict
 from functools import partial
-from asyncio import new_event_loop
+from asyncio import new_event_loop, StreamReader
 from io import BytesIO
-from typing import Dict, Set
-
-from .utils import opposite_dict
+from typing import Dict, Set, Callable, Optional, List
 
 MESSAGE_LENGTH_FMT = 'I'
+READ_SIZE = 1024
 
 
 def set_nonblocking(fd):
@@ -31,64 +30,200 @@ def blocking_read(fd, n):
 
 
 class Piping:
+    """
+    Relays data between fds using a private event loop.
+    Data read from a source fd is appended to the buffer of each of its destination fds.
+    A destination can be given a buffer limit - if it falls behind by more than that, it is dropped instead of
+    letting its buffer grow, so a slow consumer can't stall the rest of the relay.
+    A destination that must not be dropped can be given a pause limit instead - while it falls behind by more than
+    that, its sources aren't read, so they are held back by it instead of growing its buffer.
+    """
+
     def __init__(self, pipe_dict: Dict[int, Set[int]]):
-        self.buffers = defaultdict(bytes)
+        self.buffers: Dict[int, bytearray] = defaultdict(bytearray)
+        self.buffer_limits: Dict[int, int] = {}
+        self.pause_limits: Dict[int, int] = {}
+        self.pausing: Set[int] = set()
+        self.drop_callbacks: Dict[int, Callable[[int], None]] = {}
+        self.taps: Dict[int, List[Callable[[bytes], None]]] = defaultdict(list)
+        self.filters: Dict[int, Callable[[bytes], bytes]] = {}
         self.loop = new_event_loop()
+        self.readers_to_writers: Dict[int, Set[int]] = {}
+        self.writers_to_readers: Dict[int, Set[int]] = defaultdict(set)
+        self.drained: Set[int] = set()
         for src_fd, dest_fds in pipe_dict.items():
-            self.loop.add_reader(src_fd, partial(self._read, src_fd, dest_fds))
+            self.add_reader(src_fd)
             for dest_fd in dest_fds:
-                self.loop.add_writer(dest_fd, partial(self._write, dest_fd))
-        self.readers_to_writers = dict(pipe_dict)
-        self.writers_to_readers = opposite_dict(pipe_dict)
+                self.add_pipe(src_fd, dest_fd)
+
+    def add_reader(self, src_fd: int):
+        """
+        Start reading from src_fd. Until pipes from it are added, the data read from it is discarded -
+        this is still useful for detecting when it is closed.
+        """
+        if src_fd not in self.readers_to_writers:
+            self.readers_to_writers[src_fd] = set()
+            self.loop.add_reader(src_fd, partial(self._read, src_fd))
+
+    def drain(self, src_fd: int):
+        """
+        Keep reading from src_fd until it is closed, even without pipes from it, so writing to it never blocks.
+        Must be called before run() or from within the loop.
+        """
+        self.add_reader(src_fd)
+        self.drained.add(src_fd)
+
+    def add_pipe(self, src_fd: int, dest_fd: int, buffer_limit: Optional[int] = None,
+                 drop_callback: Optional[Callable[[int], None]] = None, pause_limit: Optional[int] = None):
+        """
+        Pipe data from src_fd to dest_fd. Must be called before run() or from within the loop.
+
+        :param buffer_limit: If given, dest_fd is dropped when more than this many bytes are pending for it.
+        :param pause_limit: If given, the sources of dest_fd aren't read while more than this many bytes are
+                            pending for it.
+        :param drop_callback: Called with dest_fd when it is dropped, either for being too slow or for being closed.
+        """
+        self.add_reader(src_fd)
+        self.readers_to_writers[src_fd].add(dest_fd)
+        self.writers_to_readers[dest_fd].add(src_fd)
+        if buffer_limit is not None:
+            self.buffer_limits[dest_fd] = buffer_limit
+        if pause_limit is not None:
+            self.pause_limits[dest_fd] = pause_limit
+        if drop_callback is not None:
+            self.drop_callbacks[dest_fd] = drop_callback
+
+    def add_tap(self, src_fd: int, callback: Callable[[bytes], None]):
+        """ Call callback with every chunk read from src_fd. It is called from the loop, so it should be quick. """
+        self.taps[src_fd].append(callback)
+
+    def set_filter(self, src_fd: int, func: Callable[[bytes], bytes]):
+        """ Pass every chunk read from src_fd through func before relaying it. Called after the taps. """
+        self.filters[src_fd] = func
+
+    def write(self, dest_fd: int, data: bytes):
+        """ Queue data to be written to dest_fd after the data already pending for it. Must be called from the loop. """
+        if not data or dest_fd not in self.writers_to_readers:
+            return
+        buffer = self.buffers[dest_fd]
+        if not buffer:
+            self.loop.add_writer(dest_fd, partial(self._write, dest_fd))
+        buffer += data
+        buffer_limit = self.buffer_limits.get(dest_fd)
+        if buffer_limit is not None and len(buffer) > buffer_limit:
+            self._drop(dest_fd)
+            return
+        pause_limit = self.pause_limits.get(dest_fd)
+        if pause_limit is not None and len(buffer) > pause_limit and dest_fd not in self.pausing:
+            self.pausing.add(dest_fd)
+            for src_fd in self.writers_to_readers[dest_fd]:
+                self.loop.remove_reader(src_fd)
+
+    def _resume_sources(self, dest_fd):
+        self.pausing.discard(dest_fd)
+        for src_fd in self.writers_to_readers.get(dest_fd, ()):
+            writers = self.readers_to_writers.get(src_fd)
+            if writers is not None and self.pausing.isdisjoint(writers):
+                self.loop.add_reader(src_fd, partial(self._read, src_fd))
 
     def _remove_writer(self, writer_fd):
+        if writer_fd in self.pausing:
+            self._resume_sources(writer_fd)
         self.loop.remove_writer(writer_fd)
-        for reader_fd in self.writers_to_readers.pop(writer_fd):
-            self.readers_to_writers.pop(reader_fd)
+        self.buffers.pop(writer_fd, None)
+        self.buffer_limits.pop(writer_fd, None)
+        self.pause_limits.pop(writer_fd, None)
+        for reader_fd in self.writers_to_readers.pop(writer_fd, ()):
+            reader_writers = self.readers_to_writers.get(reader_fd)
+            if reader_writers is not None:
+                reader_writers.discard(writer_fd)
+                if not reader_writers and reader_fd not in self.drained:
+                    self._remove_reader(reader_fd)
 
     def _remove_reader(self, reader_fd):
-        # remove all writers that im the last to write to, remove all that write to me, if nothing left stop loop
+        # remove all writers that im the last to write to, and stop writing to myself
         self.loop.remove_reader(reader_fd)
-        writer_fds = self.readers_to_writers.pop(reader_fd)
-        for writer_fd in writer_fds:
-            writer_readers = self.writers_to_readers[writer_fd]
-            writer_readers.remove(reader_fd)
-            if not writer_readers:
-                self._remove_writer(writer_fd)
-
-    def _read(self, src_fd, dest_fds):
+        self.drained.discard(reader_fd)
+        for writer_fd in self.readers_to_writers.pop(reader_fd, ()):
+            writer_readers = self.writers_to_readers.get(writer_fd)
+            if writer_readers is not None:
+                writer_readers.discard(reader_fd)
+                if not writer_readers and not self.buffers.get(writer_fd):
+                    # A writer with pending data is removed once its buffer is flushed
+                    self._remove_writer(writer_fd)
+
+    def _drop(self, fd):
+        self._remove_writer(fd)
+        self._remove_reader(fd)
+        drop_callback = self.drop_callbacks.pop(fd, None)
+        if drop_callback is not None:
+            drop_callback(fd)
+        self._stop_if_done()
+
+    def _stop_if_done(self):
+        if not any(self.readers_to_writers.values()) and not any(self.buffers.values()) and not self.drained:
+            self.loop.stop()
+
+    def _read(self, src_fd):
         try:
-            data = os.read(src_fd, 1024)
+            data = os.read(src_fd, READ_SIZE)
         except OSError:
-            data = ''
-        if data:
-            for dest_fd in dest_fds:
-                self.buffers[dest_fd] += data
-        else:
-            self._remove_reader(src_fd)
-            if src_fd in self.writers_to_readers:
-                self._remove_writer(src_fd)
-            if not self.readers_to_writers:
-                self.loop.stop()
+            data = b''
+        if not data:
+            if src_fd in self.drop_callbacks:
+                self._drop(src_fd)
+            else:
+                self._remove_reader(src_fd)
+                if src_fd in self.writers_to_readers:
+                    self._remove_writer(src_fd)
+                self._stop_if_done()
+            return
+        for tap in self.taps.get(src_fd, ()):
+            tap(data)
+        data_filter = self.filters.get(src_fd)
+        if data_filter is not None:
+            data = data_filter(data)
+        for dest_fd in list(self.readers_to_writers.get(src_fd, ())):
+            self.write(dest_fd, data)
 
     def _write(self, dest_fd):
         buffer = self.buffers[dest_fd]
-        if buffer:
-            self.buffers[dest_fd] = buffer[os.write(dest_fd, buffer):]
+        try:
+            written = os.write(dest_fd, buffer)
+        except BlockingIOError:
+            return
+        except OSError:
+            self._drop(dest_fd)
+            return
+        del buffer[:written]
+        if dest_fd in self.pausing and len(buffer) <= self.pause_limits[dest_fd]:
+            self._resume_sources(dest_fd)
+        if not buffer:
+            self.loop.remove_writer(dest_fd)
+            if not self.writers_to_readers.get(dest_fd):
+                self._remove_writer(dest_fd)
+                self._stop_if_done()
 
     def run(self):
-        self.loop.run_forever()
-        # TODO: is this needed?
-        # for dest_fd, buffer in self.buffers.items():
-        #     while buffer:
-        #         buffer = buffer[os.write(dest_fd, buffer):]
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+
+def _load_message(message: bytes):
+    # Messages are read from untrusted peers, like the clients of a broker, so unlike pickle, loading can't run code
+    return json.loads(message)
+
+
+def pack_message(obj) -> bytes:
+    """ Pack a message of JSON serializable data """
+    message = json.dumps(obj).encode()
+    return struct.pack(MESSAGE_LENGTH_FMT, len(message)) + message
 
 
 def send_message(sock, obj):
-    message = pickle.dumps(obj)
-    message_len = struct.pack(MESSAGE_LENGTH_FMT, len(message))
-    sock.sendall(message_len)
-    sock.sendall(message)
+    sock.sendall(pack_message(obj))
 
 
 def receive_message(sock):
@@ -96,4 +231,23 @@ def receive_message(sock):
     len_bytes = blocking_read(sock, len_len)
     message_len = struct.unpack(MESSAGE_LENGTH_FMT, len_bytes)[0]
     message = blocking_read(sock, message_len)
-    return pickle.loads(message)
+    return _load_message(message)
+
+
+def unpack_message(buffer: bytearray):
+    """ Return the first message in the buffer and remove it from the buffer, or None if it isn't complete yet """
+    len_len = struct.calcsize(MESSAGE_LENGTH_FMT)
+    if len(buffer) < len_len:
+        return None
+    message_len = struct.unpack(MESSAGE_LENGTH_FMT, buffer[:len_len])[0]
+    if len(buffer) < len_len + message_len:
+        return None
+    message = bytes(buffer[len_len:len_len + message_len])
+    del buffer[:len_len + message_len]
+    return _load_message(message)
+
+
+async def read_message(reader: StreamReader):
+    len_bytes = await reader.readexactly(struct.calcsize(MESSAGE_LENGTH_FMT))
+    message_len = struct.unpack(MESSAGE_LENGTH_FMT, len_bytes)[0]
+    return _load_message(await reader.readexactly(message_len))
@@ -0,0 +1,146 @@
+import ctypes
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Any
+
+from prompt_toolkit.completion import Completer, Completion, CompleteEvent
+from prompt_toolkit.document import Document
+
+from .consts import COMPLETION_CACHE_SIZE
+
+# A name being typed, that isn't an attribute
+NAME_BEFORE_CURSOR = re.compile(r'(?<![\w.])[^\W\d]\w*$')
+
+
+class _Cancelled(BaseException):
+    """ Raised in a completion thread to stop it """
+
+
+class _Completions:
+    """ Completions computed in a background thread, readable while they are being computed. """
+
+    def __init__(self):
+        self.completions: List[Completion] = []
+        self.done = threading.Event()
+        self.compute_time = None
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def start(self, completer: Completer, document: Document, complete_event: CompleteEvent):
+        self.thread = threading.Thread(target=self._compute, args=(completer, document, complete_event),
+                                       name='madbg-completer', daemon=True)
+        self.thread.start()
+
+    def _compute(self, completer: Completer, document: Document, complete_event: CompleteEvent):
+        start = time.perf_counter()
+        try:
+            try:
+                for completion in completer.get_completions(document, complete_event):
+                    self.completions.append(completion)
+            finally:
+                self.compute_time = time.perf_counter() - start
+                with self.lock:
+                    self.done.set()
+        except _Cancelled:
+            pass
+
+    def cancel(self):
+        """
+        Stop computing, even in the middle of the completer's work, so it doesn't go on
+        reading the program's namespace once the program resumes.
+        """
+        with self.lock:
+            if self.thread is None or self.done.is_set():
+                return
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(self.thread.ident),
+                                                       ctypes.py_object(_Cancelled))
+
+
+class NamespaceCompleter(Completer):
+    """ Completes the name being typed from namespaces, fast enough to stand in for slower completers """
+
+    def __init__(self, get_namespaces: Callable[[], Iterable[Mapping[str, Any]]]):
+        self.get_namespaces = get_namespaces
+
+    def get_completions(self, document: Document, complete_event: CompleteEvent) -> Iterable[Completion]:
+        match = NAME_BEFORE_CURSOR.search(document.text_before_cursor)
+        if match is None:
+            return
+        prefix = match.group()
+        names = {name for namespace in self.get_namespaces() for name in namespace if name.startswith(prefix)}
+        for name in sorted(names):
+            yield Completion(name, start_position=-len(prefix))
+
+
+class CompletionStats:
+    def __init__(self):
+        self.count = 0
+        self.total_latency = 0.
+        self.max_latency = 0.
+        self.partial = 0
+
+    def add(self, latency: float, partial: bool):
+        self.count += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.partial += partial
+
+    def __str__(self):
+        average = self.total_latency / self.count if self.count else 0.
+        return f'{self.count} completions, average latency {average * 1000:.1f}ms, ' \
+               f'max latency {self.max_latency * 1000:.1f}ms, {self.partial} partial'
+
+
+class BudgetedCompleter(Completer):
+    """
+    Wraps a completer so that completing never holds the prompt for more than a time budget.
+    Completions are computed in a background thread, and whatever is ready when the budget runs out is returned,
+    along with the completions of the fallback completer, which should be quick.
+    The computation goes on, and its results are cached, so completing the same text again returns them all.
+    The cache is cleared when the current frame changes, and can be invalidated explicitly,
+    like when the program resumes, which also stops the computations that are still running.
+    """
+
+    def __init__(self, completer: Completer, get_frame: Callable[[], Any], budget: float,
+                 fallback: Optional[Completer] = None):
+        self.completer = completer
+        self.get_frame = get_frame
+        self.budget = budget
+        self.fallback = fallback
+        self.stats = CompletionStats()
+        self.cache: Dict[Tuple[str, int], _Completions] = {}
+        self.cached_frame = None
+
+    def invalidate(self):
+        for completions in self.cache.values():
+            completions.cancel()
+        self.cache.clear()
+
+    def _get_cached(self, document: Document, complete_event: CompleteEvent) -> _Completions:
+        frame = self.get_frame()
+        if frame is not self.cached_frame or len(self.cache) >= COMPLETION_CACHE_SIZE:
+            self.invalidate()
+            self.cached_frame = frame
+        key = (document.text, document.cursor_position)
+        completions = self.cache.get(key)
+        if completions is None:
+            completions = self.cache[key] = _Completions()
+            completions.start(self.completer, document, complete_event)
+        return completions
+
+    def get_completions(self, document: Document, complete_event: CompleteEvent) -> Iterable[Completion]:
+        start = time.perf_counter()
+        completions = self._get_cached(document, complete_event)
+        done = completions.done.wait(self.budget)
+        # Copy, as more completions may be added in the background
+        result = list(completions.completions)
+        if not done and self.fallback is not None:
+            found = {completion.text for completion in result}
+            result.extend(completion for completion in self.fallback.get_completions(document, complete_event)
+                          if completion.text not in found)
+        self.stats.add(time.perf_counter() - start, partial=not done)
+        return result
+
+    def close(self):
+        self.invalidate()
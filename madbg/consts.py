@@ -3,5 +3,41 @@ STDOUT_FILENO = 1
 STDERR_FILENO = 2
 
 DEFAULT_PORT = 0xdb9
+DEFAULT_BROKER_PORT = 0xdb8
 DEFAULT_IP = '127.0.0.1'
 DEFAULT_CONNECT_TIMEOUT = 10.
+# How many ports after its parent's a forked child may listen on
+FORK_PORT_RANGE = 256
+
+# Output pending for the client beyond this many bytes holds the debugged program back, like a terminal would
+CLIENT_BUFFER_SIZE = 1 << 20
+DEFAULT_OBSERVER_BUFFER_SIZE = 1 << 20
+OBSERVER_HANDSHAKE_TIMEOUT = 5.
+OBSERVER_HANDSHAKE_MAX_SIZE = 1 << 16
+
+RECORDING_FLUSH_INTERVAL = 0.2
+RECORDING_INDEX_INTERVAL = 1.
+
+# Predicted echo is only shown when the echo round trip is at least this long, in seconds
+PREDICTION_MIN_RTT = 0.03
+PREDICTION_MAX_PENDING = 32
+
+DEFAULT_COMPLETION_BUDGET = 0.3
+COMPLETION_CACHE_SIZE = 256
+
+LOGPOINT_BUFFER_SIZE = 1000
+LOGPOINT_FLUSH_INTERVAL = 0.1
+# Maximal hits per second logged for each logpoint
+DEFAULT_LOGPOINT_RATE = 100.
+
+# Heartbeats are TCP keepalive probes, sent after the connection was quiet for this many seconds
+DEFAULT_HEARTBEAT_INTERVAL = 10.
+# How many unanswered heartbeats mean the client is gone
+HEARTBEAT_PROBES = 3
+WATCHDOG_CHECK_INTERVAL = 0.5
+
+# Recursion is collapsed when a pattern of up to this many frames repeats at least this many times
+STACK_MAX_REPEAT_PERIOD = 8
+STACK_MIN_REPEATS = 3
+# How many frames around the current one `where` shows
+DEFAULT_STACK_PAGE_SIZE = 20
@@ -1,4 +1,6 @@
 from __future__ import annotations
+import builtins
+import reprlib
 import runpy
 import os
 import socket
@@ -7,6 +9,7 @@ import traceback
 from bdb import BdbQuit
 from contextlib import contextmanager, nullcontext
 from termios import tcdrain
+from time import perf_counter
 from typing import Optional, ContextManager
 
 from IPython.terminal.debugger import TerminalPdb
@@ -18,6 +21,17 @@ from inspect import currentframe
 from .utils import preserve_sys_state, run_thread
 from .tty_utils import print_to_ctty, PTY
 from .communication import receive_message, Piping
+from .consts import CLIENT_BUFFER_SIZE
+from .observers import SessionObservers
+from .recording import SessionRecorder, INPUT, OUTPUT
+from .options import SessionOptions
+from .completion import BudgetedCompleter, NamespaceCompleter
+from .watchpoints import Watchpoints, WatchpointMonitor, MONITORING_AVAILABLE
+from .logpoints import Logpoints, LogpointMonitor, LogOutput
+from .metrics import SessionStats, RELAYED_INPUT, RELAYED_OUTPUT, session_started, session_ended, dump_stats
+from .stepping import StepMonitor, is_generator_or_coroutine, step_calls_filter, line_skipping_tracer
+from .watchdog import SessionWatchdog
+from .stack import summarize_stack
 
 
 class RemoteIPythonDebugger(TerminalPdb):
@@ -38,7 +52,8 @@ class RemoteIPythonDebugger(TerminalPdb):
     def _set_current_instance(cls, new: Optional[RemoteIPythonDebugger]) -> None:
         cls._CURRENT_INSTANCE = new
 
-    def __init__(self, stdin, stdout, term_type):
+    def __init__(self, stdin, stdout, term_type, options: SessionOptions = SessionOptions(),
+                 stats: Optional[SessionStats] = None):
         # A patch until https://github.com/ipython/ipython/issues/11745 is solved
         TerminalInteractiveShell.simple_prompt = False
         term_input = Vt100Input(stdin)
@@ -46,6 +61,24 @@ class RemoteIPythonDebugger(TerminalPdb):
         super().__init__(pt_session_options=dict(input=term_input, output=term_output), stdin=stdin, stdout=stdout)
         self.use_rawinput = True
         self.done_callback = None
+        self.completer = BudgetedCompleter(self._ptcomp, lambda: getattr(self, 'curframe', None),
+                                           options.completion_budget, NamespaceCompleter(self._namespaces))
+        self.pt_app.completer = self.completer
+        self.stats = SessionStats() if stats is None else stats
+        self.stats.completion_stats = self.completer.stats
+        self.watchpoints = Watchpoints()
+        self.watchpoint_monitor = WatchpointMonitor(self.watchpoints, self._trace_from) \
+            if MONITORING_AVAILABLE else None
+        self.log_output = LogOutput(stdout.fileno())
+        self.logpoints = Logpoints(self.log_output, self.canonic)
+        self.logpoint_monitor = LogpointMonitor(self.logpoints) if MONITORING_AVAILABLE else None
+        self.step_monitor = StepMonitor(self._trace_from) if MONITORING_AVAILABLE else None
+        self._calls_filter = None
+        self._new_frame_trace = None
+        self._untraced_lines_frame = None
+        self._detach_reason: Optional[str] = None
+        self.stack_page_size = options.stack_page_size
+        self._hidden_frames_cache = {}
 
     def trace_dispatch(self, frame, event, arg, check_debugging_global=False):
         """
@@ -59,16 +92,40 @@ class RemoteIPythonDebugger(TerminalPdb):
                 self.set_trace(frame)
             else:
                 return None
+        stats = self.stats
+        stopped_seconds = stats.stopped_seconds
+        start = perf_counter()
         bdb_quit = False
         try:
-            return super().trace_dispatch(frame, event, arg)
+            trace_function = super().trace_dispatch(frame, event, arg)
         except BdbQuit:
             bdb_quit = True
+            return None
         finally:
+            stats.trace_events += 1
+            stats.trace_seconds += perf_counter() - start - (stats.stopped_seconds - stopped_seconds)
             if self.quitting or bdb_quit:
                 self._on_done()
+        if self._new_frame_trace is not None:
+            # The returned trace function replaces the local trace function of the frame
+            traced_frame, new_trace = self._new_frame_trace
+            self._new_frame_trace = None
+            if traced_frame is frame:
+                return new_trace
+        return trace_function
+
+    def _set_frame_trace(self, frame, trace_function):
+        """ Set the local trace function of a frame, even if it is the frame currently being traced """
+        frame.f_trace = trace_function
+        self._new_frame_trace = frame, trace_function
 
     def _on_done(self):
+        if self._detach_reason is not None:
+            self._detach()
+        self._stop_monitors()
+        self.watchpoints.clear()
+        self.logpoints.clear()
+        self.log_output.close()
         if self.done_callback is not None:
             self.done_callback()
             self.done_callback = None
@@ -83,6 +140,377 @@ class RemoteIPythonDebugger(TerminalPdb):
             frame = currentframe().f_back
         return super().set_trace(frame)
 
+    def break_anywhere(self, frame):
+        """ Overriding super to trace frames that could change a watched value or have logpoints """
+        return self.watchpoints.watches_code(frame.f_code) or self.logpoints.in_code(frame.f_code) is not None \
+            or super().break_anywhere(frame)
+
+    def break_here(self, frame):
+        """ Overriding super to log logpoints, and stop when a watched value changes """
+        if self.logpoints:
+            self.logpoints.hit(frame)
+        if self.watchpoints.watches_code(frame.f_code) and self.watchpoints.any_changed():
+            # Make sure no breakpoint commands are run
+            self.currentbp = 0
+            return True
+        return super().break_here(frame)
+
+    def dispatch_return(self, frame, arg):
+        """ Overriding super to stop when a watched value is changed right before returning """
+        if self.watchpoints.watches_code(frame.f_code) and self.watchpoints.any_changed():
+            try:
+                self.frame_returning = frame
+                self.user_return(frame, arg)
+            finally:
+                self.frame_returning = None
+            if self.quitting:
+                raise BdbQuit
+            return self.trace_dispatch
+        return super().dispatch_return(frame, arg)
+
+    def interaction(self, frame, traceback):
+        """
+        Overriding super to show which watched values changed, and hold logpoint output while stopped.
+        A detached session doesn't stop anymore.
+        """
+        self._stop_monitors()
+        if self._calls_filter is not None and sys.gettrace() is self._calls_filter:
+            # Stepping needs all calls to be traced
+            sys.settrace(self.trace_dispatch)
+            self._calls_filter = None
+        if self._untraced_lines_frame is not None:
+            self._untraced_lines_frame.f_trace_lines = True
+            self._untraced_lines_frame = None
+        if self._detach_reason is not None:
+            self._detach()
+            return
+        for change in self.watchpoints.update_changed():
+            print(change, file=self.stdout)
+        self.log_output.flush()
+        self.log_output.paused = True
+        self.stats.stop_started()
+        try:
+            return super().interaction(frame, traceback)
+        finally:
+            # The program may change its namespace once it resumes, and must not be inspected meanwhile
+            self.completer.invalidate()
+            self.stats.stop_ended()
+            self.log_output.paused = False
+
+    def preloop(self):
+        """ Overriding super to measure how long it took to get to the first prompt """
+        self.stats.prompt_shown()
+        super().preloop()
+
+    def postcmd(self, stop, line):
+        """ Overriding super to detach when asked to while the command ran or the prompt waited for input """
+        if self._detach_reason is not None:
+            self._detach()
+            return True
+        return super().postcmd(stop, line)
+
+    def detach(self, reason: str):
+        """
+        Clear all breakpoints, resume the program and end the session, for when no one attends it.
+        Can be called from any thread, and again until the session ends: a prompt waiting for input is interrupted,
+        and a running program is detached on its next trace event, or when it stops next if it isn't traced.
+        """
+        self._detach_reason = reason
+        self.quitting = True
+        app = self.pt_app.app
+        loop = app.loop
+        if loop is None or not app.is_running:
+            return
+
+        def interrupt_prompt():
+            if app.is_running and app.future is not None and not app.future.done():
+                app.exit(exception=EOFError())
+
+        try:
+            loop.call_soon_threadsafe(interrupt_prompt)
+        except RuntimeError:
+            # The prompt returned and closed its loop meanwhile
+            pass
+
+    def _namespaces(self):
+        """ The namespaces of the current frame, to complete names from when the full completion is too slow """
+        frame = getattr(self, 'curframe', None)
+        if frame is None:
+            return ()
+        return self.curframe_locals, frame.f_globals, vars(builtins)
+
+    def _detach(self):
+        print(f'\nDetaching: {self._detach_reason}', file=self.stdout)
+        self._detach_reason = None
+        self.clear_all_breaks()
+        self.watchpoints.clear()
+        self.logpoints.clear()
+        self._stop_monitors()
+        self.set_quit()
+
+    def _stop_monitors(self):
+        for monitor in (self.watchpoint_monitor, self.logpoint_monitor, self.step_monitor):
+            if monitor is not None:
+                monitor.stop()
+
+    def _start_monitors(self, frame) -> bool:
+        monitors = []
+        if self.watchpoints:
+            monitors.append(self.watchpoint_monitor)
+        if self.logpoints:
+            monitors.append(self.logpoint_monitor)
+        if None in monitors:
+            return False
+        for monitor in monitors:
+            if not monitor.start(frame):
+                self._stop_monitors()
+                return False
+        return True
+
+    def _make_calls_filter(self):
+        """
+        Return a global trace function for continuing without breakpoints, which traces only frames with
+        logpoints or that could change a watched value, and spares all other calls the full trace_dispatch handling.
+        """
+        filters = []
+        if self.watchpoints:
+            filters.append(self.watchpoints.call_filter(self.trace_dispatch))
+        if self.logpoints:
+            filters.append(self.logpoints.call_filter())
+        if len(filters) == 1:
+            return filters[0]
+        watch_filter, log_filter = filters
+
+        def filter_calls(frame, event, arg):
+            return watch_filter(frame, event, arg) or log_filter(frame, event, arg)
+
+        return filter_calls
+
+    def set_continue(self):
+        """
+        Overriding super to keep checking watchpoints and logpoints.
+        When there are no breakpoints and sys.monitoring is available, it is used instead of a trace function.
+        Otherwise tracing goes on, but only frames with logpoints or that could change a watched value
+        are traced line by line.
+        """
+        if not self.watchpoints and not self.logpoints:
+            return super().set_continue()
+        frame = sys._getframe().f_back
+        if not self.breaks and self._start_monitors(frame):
+            return super().set_continue()
+        self._set_stopinfo(self.botframe, None, -1)
+        if not self.breaks:
+            self._calls_filter = self._make_calls_filter()
+            sys.settrace(self._calls_filter)
+            while frame and frame is not self.botframe:
+                if not self.watchpoints.watches_code(frame.f_code):
+                    logpoints = self.logpoints.in_code(frame.f_code)
+                    if logpoints is None:
+                        del frame.f_trace
+                    else:
+                        self._set_frame_trace(frame, self.logpoints.line_tracer(logpoints))
+                frame = frame.f_back
+
+    def set_next(self, frame):
+        """ Overriding super to run callees untraced """
+        super().set_next(frame)
+        self._run_to_stop(frame, self.stoplineno)
+
+    def set_until(self, frame, lineno=None):
+        """ Overriding super to run callees and the lines before the target line untraced """
+        super().set_until(frame, lineno)
+        self._run_to_stop(frame, self.stoplineno)
+
+    def set_return(self, frame):
+        """ Overriding super to run callees and the rest of the frame untraced """
+        super().set_return(frame)
+        if self.returnframe is frame:
+            self._run_to_stop(frame, None)
+
+    def _run_to_stop(self, frame, stoplineno: Optional[int]):
+        """
+        Run the stepped frame until it reaches a line greater or equal to stoplineno, or returns if it is None,
+        without passing calls to other frames to trace_dispatch, as the debugger won't stop in them.
+        When sys.monitoring is available, it is used instead of a trace function.
+        Generators are left to bdb, as they are stepped across resumes, and so are steps from a return,
+        which go on in the caller, and need it to be traced.
+        """
+        if self.breaks or self.watchpoints or self.logpoints or self.skip or self.stopframe is None \
+                or self.frame_returning is not None \
+                or is_generator_or_coroutine(frame) or is_generator_or_coroutine(self.stopframe):
+            return
+        if self.step_monitor is not None and self.step_monitor.start(frame, stoplineno):
+            sys.settrace(None)
+            traced_frame = sys._getframe().f_back
+            while traced_frame and traced_frame is not self.botframe:
+                del traced_frame.f_trace
+                traced_frame = traced_frame.f_back
+            return
+        self._calls_filter = step_calls_filter(self)
+        sys.settrace(self._calls_filter)
+        if stoplineno is None:
+            frame.f_trace_lines = False
+            self._untraced_lines_frame = frame
+        elif stoplineno > frame.f_lineno:
+            self._set_frame_trace(frame, line_skipping_tracer(self, stoplineno))
+
+    def _trace_from(self, frame, event, arg):
+        """
+        Called by a monitor when the debugger should handle an event of the frame, like reaching a step's target,
+        to pass it to trace_dispatch and go on debugging with a trace function.
+        """
+        traced_frame = frame
+        while traced_frame is not None:
+            traced_frame.f_trace = self.trace_dispatch
+            if traced_frame is self.botframe:
+                break
+            traced_frame = traced_frame.f_back
+        sys.settrace(self.trace_dispatch)
+        trace_function = self.trace_dispatch(frame, event, arg)
+        if trace_function is not None:
+            frame.f_trace = trace_function
+
+    def do_watch(self, arg):
+        """watch [expression]
+        Stop when the value of the expression changes. Without an expression, list the watchpoints.
+        The expression is evaluated in the current frame, and checked only when running code that refers
+        to one of its names - so changes made through an alias are noticed only once such code runs.
+        """
+        if not arg:
+            for watchpoint in self.watchpoints:
+                print(watchpoint, file=self.stdout)
+            return
+        try:
+            watchpoint = self.watchpoints.add(arg, self.curframe, self.curframe_locals)
+        except SyntaxError as e:
+            self.error(f'Invalid expression: {e}')
+            return
+        print(f'Watchpoint {watchpoint.number}: {arg} = {reprlib.repr(watchpoint.value)}', file=self.stdout)
+
+    def do_unwatch(self, arg):
+        """unwatch [number]
+        Delete the given watchpoint, or all watchpoints.
+        """
+        if not arg:
+            self.watchpoints.clear()
+            return
+        try:
+            self.watchpoints.remove(int(arg))
+        except (ValueError, KeyError):
+            self.error(f'No watchpoint numbered {arg}')
+
+    def do_logpoint(self, arg):
+        """logpoint [[filename:]lineno expression[, expression...]]
+        Log the values of the expressions every time the line runs, without stopping.
+        The output is sent to the client in the background, and logpoints hitting more often than
+        the client can take are dropped, so the program is never held back by the logging.
+        Without arguments, list the logpoints.
+        """
+        if not arg:
+            for logpoint in self.logpoints:
+                print(logpoint, file=self.stdout)
+            return
+        location, _, expression = arg.partition(' ')
+        filename, colon, lineno = location.rpartition(':')
+        if colon:
+            filename = self.lookupmodule(filename)
+            if not filename:
+                self.error(f'{location.rpartition(":")[0]!r} not found from sys.path')
+                return
+        else:
+            filename = self.defaultFile()
+        try:
+            lineno = int(lineno)
+        except ValueError:
+            self.error(f'Bad line number: {lineno}')
+            return
+        if not expression.strip():
+            self.error('Missing expressions to log')
+            return
+        if not self.checkline(filename, lineno):
+            return
+        try:
+            logpoint = self.logpoints.add(self.canonic(filename), lineno, expression.strip())
+        except SyntaxError as e:
+            self.error(f'Invalid expression: {e}')
+            return
+        print(f'Logpoint {logpoint.number} at {logpoint.filename}:{lineno}', file=self.stdout)
+
+    def do_unlogpoint(self, arg):
+        """unlogpoint [number]
+        Delete the given logpoint, or all logpoints.
+        """
+        if not arg:
+            self.logpoints.clear()
+            return
+        try:
+            self.logpoints.remove(int(arg))
+        except (ValueError, KeyError):
+            self.error(f'No logpoint numbered {arg}')
+
+    def forget(self):
+        """ Overriding super to drop the frames of the last stop """
+        super().forget()
+        self._hidden_frames_cache.clear()
+
+    def _hidden_predicate(self, frame):
+        """
+        Overriding super to check each frame once per stop, instead of on every up, down and where,
+        as checking reads the locals of every frame in the stack.
+        """
+        if frame is self.curframe:
+            return super()._hidden_predicate(frame)
+        key = (frame, tuple(self._predicates.items()))
+        if key not in self._hidden_frames_cache:
+            self._hidden_frames_cache[key] = super()._hidden_predicate(frame)
+        return self._hidden_frames_cache[key]
+
+    def print_stack_trace(self, context=None, show_all=False):
+        """
+        Overriding super to collapse recursion and show only the frames around the current one,
+        so showing a deep stack takes about as long as a shallow one. Only the shown frames' source is read.
+        """
+        previous_context = self.context
+        if context is not None:
+            self.context = context
+        hidden = self.hidden_frames(self.stack) if self.skip_hidden else [False] * len(self.stack)
+        keys = [(frame.f_code, lineno) for frame, lineno in self.stack]
+        page_size = None if show_all else self.stack_page_size
+        try:
+            rows = summarize_stack(keys, hidden, self.curindex, page_size)
+            print(''.join(row + '\n' if isinstance(row, str) else self.format_stack_entry(self.stack[row], '')
+                          for row in rows), end='', file=self.stdout)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.context = previous_context
+
+    def do_where(self, arg):
+        """w(here) [all] [context]
+        Print a stack trace, with the most recent frame at the bottom.
+        An arrow indicates the "current frame", which determines the
+        context of most commands. 'bt' is an alias for this command.
+
+        Repeated frames of a recursion are collapsed, and only the frames around the current one are shown,
+        unless 'all' is given. Take a number as argument as an (optional) number of context line to print.
+        """
+        args = arg.split()
+        show_all = 'all' in args
+        if show_all:
+            args.remove('all')
+        context = None
+        if args:
+            try:
+                context = int(args[0])
+                if context <= 0:
+                    raise ValueError()
+            except ValueError:
+                self.error('The context must be a positive number of lines')
+                return
+        self.print_stack_trace(context, show_all)
+
+    do_w = do_bt = do_where
+
     def do_continue(self, arg):
         """ Overriding super to add a print """
         if not self.nosigint:
@@ -91,6 +519,44 @@ class RemoteIPythonDebugger(TerminalPdb):
 
     do_c = do_cont = do_continue
 
+    def default(self, line):
+        """ Overriding super to invalidate cached completions, as the statement may change the namespace """
+        self.completer.invalidate()
+        return super().default(line)
+
+    def do_completion_budget(self, arg):
+        """completion_budget [seconds]
+        Show tab completion latency stats, and optionally set how long completion may take.
+        When the budget runs out, the completions found so far are shown with the matching names of the
+        current frame, and completing again shows more as they are found.
+        """
+        if arg:
+            try:
+                budget = float(arg)
+                if budget <= 0:
+                    raise ValueError()
+            except ValueError:
+                self.error('The completion budget must be a positive number of seconds')
+                return
+            self.completer.budget = budget
+        print(f'Completion budget: {self.completer.budget}s', file=self.stdout)
+        print(self.completer.stats, file=self.stdout)
+
+    def do_stats(self, arg):
+        """stats [json|prometheus]
+        Show how long the program was stopped, how much time tracing took, and how much was relayed to the client
+        in this session. With an argument, show the stats of the session and the totals of all sessions in the
+        process, formatted as json or in the prometheus text format.
+        """
+        if not arg:
+            print(self.stats, file=self.stdout)
+            print(self.completer.stats, file=self.stdout)
+            return
+        try:
+            print(dump_stats(output_format=arg.strip()), file=self.stdout)
+        except ValueError as e:
+            self.error(str(e))
+
     def post_mortem(self, traceback):
         self.reset()
         self.interaction(None, traceback)
@@ -122,31 +588,67 @@ class RemoteIPythonDebugger(TerminalPdb):
 
     @classmethod
     @contextmanager
-    def start(cls, sock_fd: int) -> ContextManager[RemoteIPythonDebugger]:
+    def start(cls, sock_fd: int, options: SessionOptions = SessionOptions(),
+              observers_socket: Optional[socket.socket] = None) -> ContextManager[RemoteIPythonDebugger]:
+        """
+        :param observers_socket: A listening socket to accept read-only observers of the session from,
+                                 if options.max_observers allows them.
+        """
         # TODO: just add to pipe list
         assert cls._get_current_instance() is None
+        stats = SessionStats()
         term_data = receive_message(sock_fd)
         term_attrs, term_type, term_size = term_data['term_attrs'], term_data['term_type'], term_data['term_size']
         with PTY.open() as pty:
             pty.resize(term_size[0], term_size[1])
             pty.set_tty_attrs(term_attrs)
             pty.make_ctty()
-            piping = Piping({sock_fd: {pty.master_fd}, pty.master_fd: {sock_fd}})
-            with run_thread(piping.run):
-                slave_reader = os.fdopen(pty.slave_fd, 'r')
-                slave_writer = os.fdopen(pty.slave_fd, 'w')
-                try:
-                    instance = cls(slave_reader, slave_writer, term_type)
-                    cls._set_current_instance(instance)
-                    yield instance
-                except Exception:
-                    print(traceback.format_exc(), file=slave_writer)
-                    raise
-                finally:
-                    cls._set_current_instance(None)
-                    print('Closing connection', file=slave_writer, flush=True)
-                    tcdrain(pty.slave_fd)
-                    slave_writer.close()
+            piping = Piping({sock_fd: {pty.master_fd}})
+            piping.add_pipe(pty.master_fd, sock_fd, pause_limit=CLIENT_BUFFER_SIZE)
+            observers = recorder = None
+            if observers_socket is not None and options.max_observers:
+                observers = SessionObservers(piping, observers_socket, pty.master_fd, options)
+            if options.record_path is not None:
+                recorder = SessionRecorder(options.record_path)
+                piping.add_tap(sock_fd, recorder.tap(INPUT))
+                piping.add_tap(pty.master_fd, recorder.tap(OUTPUT))
+            piping.add_tap(sock_fd, stats.relay_tap(RELAYED_INPUT))
+            piping.add_tap(pty.master_fd, stats.relay_tap(RELAYED_OUTPUT))
+            watchdog = SessionWatchdog(piping, sock_fd, pty.master_fd, stats, options, cls._detach_current_instance)
+            session_started(stats)
+            try:
+                with run_thread(piping.run):
+                    slave_reader = os.fdopen(pty.slave_fd, 'r')
+                    slave_writer = os.fdopen(pty.slave_fd, 'w')
+                    instance = None
+                    try:
+                        instance = cls(slave_reader, slave_writer, term_type, options, stats)
+                        cls._set_current_instance(instance)
+                        yield instance
+                    except Exception:
+                        print(traceback.format_exc(), file=slave_writer)
+                        raise
+                    finally:
+                        if instance is not None:
+                            instance.completer.close()
+                            instance.log_output.close()
+                        cls._set_current_instance(None)
+                        print('Closing connection', file=slave_writer, flush=True)
+                        tcdrain(pty.slave_fd)
+                        slave_writer.close()
+            finally:
+                session_ended(stats)
+                watchdog.close()
+                if observers is not None:
+                    observers.close()
+                if recorder is not None:
+                    recorder.close()
+
+    @classmethod
+    def _detach_current_instance(cls, reason: str):
+        current_instance = cls._get_current_instance()
+        if current_instance is not None:
+            current_instance.detach(reason)
 
     @classmethod
     @contextmanager
@@ -156,30 +658,43 @@ class RemoteIPythonDebugger(TerminalPdb):
         """
         server_socket = socket.socket()
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, True)
-        server_socket.bind((ip, port))
         try:
+            server_socket.bind((ip, port))
             yield server_socket
         finally:
             server_socket.close()
 
     @classmethod
     @contextmanager
-    def start_from_new_connection(cls, sock: socket.socket) -> ContextManager[RemoteIPythonDebugger]:
+    def start_from_new_connection(cls, sock: socket.socket, options: SessionOptions = SessionOptions(),
+                                  observers_socket: Optional[socket.socket] = None
+                                  ) -> ContextManager[RemoteIPythonDebugger]:
         print_to_ctty(f'Debugger client connected from {sock.getpeername()}')
         try:
-            with cls.start(sock.fileno()) as debugger:
+            with cls.start(sock.fileno(), options, observers_socket) as debugger:
                 yield debugger
         finally:
             sock.close()
 
     @classmethod
-    def connect_and_start(cls, ip: str, port: int) -> ContextManager[RemoteIPythonDebugger]:
-        # TODO: get rid of context managers at some level - nobody is going to use with start() anyway
-        current_instance = cls._get_current_instance()
-        if current_instance is not None:
-            return nullcontext(current_instance)
+    @contextmanager
+    def _wait_for_client_and_start(cls, ip: str, port: int,
+                                   options: SessionOptions) -> ContextManager[RemoteIPythonDebugger]:
         with cls.get_server_socket(ip, port) as server_socket:
             server_socket.listen(1)
             print_to_ctty(f'Waiting for debugger client on {ip}:{port}')
             sock, _ = server_socket.accept()
-        return cls.start_from_new_connection(sock)
+            observers_socket = server_socket if options.max_observers else None
+            if observers_socket is None:
+                server_socket.close()
+            with cls.start_from_new_connection(sock, options, observers_socket) as debugger:
+                yield debugger
+
+    @classmethod
+    def connect_and_start(cls, ip: str, port: int,
+                          options: SessionOptions = SessionOptions()) -> ContextManager[RemoteIPythonDebugger]:
+        # TODO: get rid of context managers at some level - nobody is going to use with start() anyway
+        current_instance = cls._get_current_instance()
+        if current_instance is not None:
+            return nullcontext(current_instance)
+        return cls._wait_for_client_and_start(ip, port, options)
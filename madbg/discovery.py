@@ -0,0 +1,100 @@
+import json
+import os
+import stat
+import sys
+import tempfile
+from typing import List, Optional
+
+from .utils import register_atexit
+
+
+def get_registry_dir() -> str:
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'madbg')
+    return os.path.join(tempfile.gettempdir(), f'madbg-{os.getuid()}')
+
+
+def _check_registry_dir(path: str):
+    """
+    Make sure the registry is a directory only the current user can write to,
+    as a shared directory like /tmp lets other users create it first and plant entries in it.
+    """
+    dir_stat = os.lstat(path)
+    if not stat.S_ISDIR(dir_stat.st_mode) or dir_stat.st_uid != os.getuid() or \
+            stat.S_IMODE(dir_stat.st_mode) != 0o700:
+        raise PermissionError(f"Refusing to use {path} as the debugger registry, "
+                              f"as it isn't a directory private to the current user")
+
+
+def _get_entry_path(pid: int) -> str:
+    return os.path.join(get_registry_dir(), f'{pid}.json')
+
+
+def _get_process_start_time(pid: int) -> Optional[int]:
+    """ Return when the process started, in clock ticks since boot, to tell it from a later one with the same pid """
+    try:
+        with open(f'/proc/{pid}/stat') as stat_file:
+            stat = stat_file.read()
+    except OSError:
+        return None
+    # The process name may contain spaces, but the fields after it don't
+    return int(stat.rsplit(')', 1)[1].split()[19])
+
+
+_unregister_at_exit = True
+
+
+def register_debugger(ip: str, port: int):
+    """ Register the current process as waiting for a debugger client on the given address, until it exits """
+    global _unregister_at_exit
+    pid = os.getpid()
+    entry = dict(pid=pid, ppid=os.getppid(), ip=ip, port=port, argv=sys.argv,
+                 start_time=_get_process_start_time(pid))
+    os.makedirs(get_registry_dir(), mode=0o700, exist_ok=True)
+    _check_registry_dir(get_registry_dir())
+    path = _get_entry_path(pid)
+    with open(f'{path}.tmp', 'w') as entry_file:
+        json.dump(entry, entry_file)
+    os.replace(f'{path}.tmp', path)
+    if _unregister_at_exit:
+        # Forked children inherit this, and unregister themselves
+        register_atexit(unregister_debugger)
+        _unregister_at_exit = False
+
+
+def unregister_debugger():
+    try:
+        os.remove(_get_entry_path(os.getpid()))
+    except OSError:
+        pass
+
+
+def list_debuggers() -> List[dict]:
+    """
+    Return the registered processes, with the address each is waiting for a debugger client on.
+    Entries of processes that exited without unregistering, like forked children that called os._exit, are removed.
+    """
+    try:
+        _check_registry_dir(get_registry_dir())
+    except FileNotFoundError:
+        return []
+    names = os.listdir(get_registry_dir())
+    entries = []
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(get_registry_dir(), name)
+        try:
+            with open(path) as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            continue
+        if _get_process_start_time(entry['pid']) != entry['start_time']:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        entries.append(entry)
+    return sorted(entries, key=lambda entry: entry['pid'])
@@ -0,0 +1,280 @@
+import os
+import reprlib
+import sys
+import threading
+import time
+from collections import deque
+from dis import findlinestarts
+from types import CodeType, FrameType
+from typing import Callable, Dict, List, Optional
+
+from .consts import LOGPOINT_BUFFER_SIZE, LOGPOINT_FLUSH_INTERVAL, DEFAULT_LOGPOINT_RATE
+from .utils import claim_monitoring_tool
+
+
+class Logpoint:
+    """
+    Expressions to evaluate and log every time a line runs, without stopping.
+    Hits are rate limited - when a logpoint hits too often, the extra hits are only counted, and not evaluated.
+    """
+
+    def __init__(self, number: int, filename: str, lineno: int, expression: str, rate: float):
+        self.number = number
+        self.filename = filename
+        self.lineno = lineno
+        self.expression = expression
+        # Evaluating all the expressions as a single tuple is cheaper than evaluating them one by one
+        self.code = compile(f'({expression},)', '<logpoint>', 'eval')
+        self.rate = rate
+        self.tokens = rate
+        self.last_refill = time.monotonic()
+        self.hits = 0
+        self.dropped = 0
+
+    def _allow_hit(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def hit(self, frame: FrameType) -> Optional[str]:
+        """ Return the line to log for this hit, or None if it was dropped by the rate limit. """
+        self.hits += 1
+        if not self._allow_hit():
+            self.dropped += 1
+            return None
+        try:
+            values = eval(self.code, frame.f_globals, frame.f_locals)
+            output = ', '.join(map(reprlib.repr, values))
+        except Exception as e:
+            output = f'<{type(e).__name__}: {e}>'
+        return f'[logpoint {self.number}] {os.path.basename(self.filename)}:{self.lineno} ' \
+               f'{self.expression} = {output}'
+
+    def __str__(self):
+        return f'{self.number:<4}logpoint     at {self.filename}:{self.lineno} logging {self.expression}, ' \
+               f'hit {self.hits} time(s), {self.dropped} dropped by rate limit'
+
+
+class LogOutput:
+    """
+    A bounded buffer of log lines, written to an fd by a separate thread.
+    Adding a line never blocks - when the buffer is full, the oldest lines are dropped and counted.
+    Writing never blocks either - the lines the fd can't take are dropped and counted too,
+    so a client that doesn't read the output can't hold back the program.
+    Flushing is also done from the prompt's thread, so it is locked to keep the lines in order.
+    """
+
+    def __init__(self, fd: int):
+        # A separate open file, so it can be non-blocking without affecting the other users of the fd
+        self.fd = os.open(f'/proc/self/fd/{fd}', os.O_WRONLY | os.O_NONBLOCK | os.O_NOCTTY)
+        self.lines = deque(maxlen=LOGPOINT_BUFFER_SIZE)
+        self.overflowed = 0
+        # The rest of a line that was partially written
+        self.unfinished = b''
+        self.paused = False
+        self.closed = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.lock = threading.Lock()
+
+    def add(self, line: str):
+        if len(self.lines) == LOGPOINT_BUFFER_SIZE:
+            self.overflowed += 1
+        self.lines.append(line)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._flush_periodically, name='madbg-logpoints', daemon=True)
+            self.thread.start()
+
+    def flush(self):
+        with self.lock:
+            if self.paused:
+                return
+            # Each chunk with the number of lines it counts for
+            chunks = [(self.unfinished, 0)]
+            while self.lines:
+                chunks.append((f'{self.lines.popleft()}\n'.encode(), 1))
+            if self.overflowed:
+                message = f'[logpoints] {self.overflowed} line(s) dropped, the output could not keep up\n'
+                chunks.append((message.encode(), self.overflowed))
+                self.overflowed = 0
+            self.unfinished = b''
+            for index, (chunk, _) in enumerate(chunks):
+                try:
+                    while chunk:
+                        chunk = chunk[os.write(self.fd, chunk):]
+                except BlockingIOError:
+                    self.unfinished = chunk
+                    self.overflowed += sum(count for _, count in chunks[index + 1:])
+                    return
+                except OSError:
+                    return
+
+    def _flush_periodically(self):
+        while not self.closed.wait(LOGPOINT_FLUSH_INTERVAL):
+            self.flush()
+
+    def close(self):
+        """ Stop the flushing thread, and write whatever is left. Can be called again, doing nothing. """
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.paused = False
+        self.flush()
+        os.close(self.fd)
+
+
+class Logpoints:
+    """ The logpoints of a debugger, with a cache of the logpoints in each code object """
+
+    def __init__(self, output: LogOutput, canonic: Callable[[str], str]):
+        self.output = output
+        self.canonic = canonic
+        self.logpoints: Dict[int, Logpoint] = {}
+        self.next_number = 1
+        self._code_cache: Dict[CodeType, Optional[Dict[int, List[Logpoint]]]] = {}
+
+    def __bool__(self):
+        return bool(self.logpoints)
+
+    def __iter__(self):
+        return iter(list(self.logpoints.values()))
+
+    def add(self, filename: str, lineno: int, expression: str, rate: float = DEFAULT_LOGPOINT_RATE) -> Logpoint:
+        logpoint = Logpoint(self.next_number, filename, lineno, expression, rate)
+        self.next_number += 1
+        self.logpoints[logpoint.number] = logpoint
+        self._code_cache.clear()
+        self.output.start()
+        return logpoint
+
+    def remove(self, number: int):
+        del self.logpoints[number]
+        self._code_cache.clear()
+
+    def clear(self):
+        self.logpoints.clear()
+        self._code_cache.clear()
+
+    def in_code(self, code: CodeType) -> Optional[Dict[int, List[Logpoint]]]:
+        """ Return the logpoints in the given code by line number, or None if it has none. """
+        try:
+            return self._code_cache[code]
+        except KeyError:
+            pass
+        by_line = None
+        filename = self.canonic(code.co_filename)
+        lines = None
+        for logpoint in self.logpoints.values():
+            if logpoint.filename != filename:
+                continue
+            if lines is None:
+                lines = {line for _, line in findlinestarts(code)}
+            if logpoint.lineno in lines:
+                by_line = by_line or {}
+                by_line.setdefault(logpoint.lineno, []).append(logpoint)
+        self._code_cache[code] = by_line
+        return by_line
+
+    def hit_line(self, logpoints: List[Logpoint], frame: FrameType):
+        for logpoint in logpoints:
+            line = logpoint.hit(frame)
+            if line is not None:
+                self.output.add(line)
+
+    def hit(self, frame: FrameType):
+        """ Log the logpoints at the frame's current line, if any """
+        by_line = self.in_code(frame.f_code)
+        if by_line is not None:
+            logpoints = by_line.get(frame.f_lineno)
+            if logpoints:
+                self.hit_line(logpoints, frame)
+
+    def line_tracer(self, by_line: Dict[int, List[Logpoint]]) -> Callable:
+        """ Return a local trace function for a frame running code with logpoints """
+
+        def trace_lines(frame, event, arg):
+            if event == 'line':
+                logpoints = by_line.get(frame.f_lineno)
+                if logpoints:
+                    self.hit_line(logpoints, frame)
+            return trace_lines
+
+        return trace_lines
+
+    def call_filter(self) -> Callable:
+        """ Return a global trace function, that traces only the calls of code with logpoints """
+        code_cache = self._code_cache
+        in_code = self.in_code
+        line_tracer = self.line_tracer
+
+        def filter_calls(frame, event, arg):
+            code = frame.f_code
+            by_line = code_cache[code] if code in code_cache else in_code(code)
+            return None if by_line is None else line_tracer(by_line)
+
+        return filter_calls
+
+
+class LogpointMonitor:
+    """
+    Logs logpoints using sys.monitoring, so the program doesn't have to run under a trace function.
+    Line events are enabled only for code objects with logpoints, and disabled on every line without a logpoint
+    the first time it runs, so only the lines with logpoints cost anything.
+    Unlike a trace function, all threads are monitored.
+    """
+    TOOL_NAME = 'madbg-logpoints'
+
+    def __init__(self, logpoints: Logpoints):
+        self.logpoints = logpoints
+        self.tool_id: Optional[int] = None
+        self.monitored_codes: List[CodeType] = []
+
+    def start(self, frame: FrameType) -> bool:
+        """ Start monitoring, including the given frame and its callers. Return False if monitoring is in use. """
+        monitoring = sys.monitoring
+        tool_id = self.tool_id = claim_monitoring_tool(self.TOOL_NAME)
+        if tool_id is None:
+            return False
+        events = monitoring.events
+        monitoring.register_callback(tool_id, events.PY_START, self._on_start)
+        monitoring.register_callback(tool_id, events.LINE, self._on_line)
+        monitoring.restart_events()
+        monitoring.set_events(tool_id, events.PY_START)
+        while frame is not None:
+            self._on_start(frame.f_code, 0)
+            frame = frame.f_back
+        return True
+
+    def stop(self):
+        if self.tool_id is None:
+            return
+        monitoring = sys.monitoring
+        monitoring.set_events(self.tool_id, 0)
+        for code in self.monitored_codes:
+            monitoring.set_local_events(self.tool_id, code, 0)
+        self.monitored_codes.clear()
+        monitoring.register_callback(self.tool_id, monitoring.events.PY_START, None)
+        monitoring.register_callback(self.tool_id, monitoring.events.LINE, None)
+        monitoring.free_tool_id(self.tool_id)
+        self.tool_id = None
+
+    def _on_start(self, code, instruction_offset):
+        if self.logpoints.in_code(code) is not None:
+            sys.monitoring.set_local_events(self.tool_id, code, sys.monitoring.events.LINE)
+            self.monitored_codes.append(code)
+        return sys.monitoring.DISABLE
+
+    def _on_line(self, code, line_number):
+        by_line = self.logpoints.in_code(code)
+        logpoints = by_line and by_line.get(line_number)
+        if not logpoints:
+            return sys.monitoring.DISABLE
+        self.logpoints.hit_line(logpoints, sys._getframe(1))
@@ -0,0 +1,210 @@
+import json
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from .completion import CompletionStats
+
+RELAYED_INPUT = 'input'
+RELAYED_OUTPUT = 'output'
+# Metrics summed over all sessions, with their prometheus help
+COUNTERS = {
+    'stops': 'Times a debugged program was stopped at the debugger prompt',
+    'stopped_seconds': 'Time debugged programs were stopped at the debugger prompt',
+    'trace_events': 'Trace events handled by the debugger',
+    'trace_seconds': 'Time spent handling trace events, excluding the time stopped at the prompt',
+    'input_bytes': 'Bytes relayed from debugger clients',
+    'input_chunks': 'Chunks relayed from debugger clients',
+    'output_bytes': 'Bytes relayed to debugger clients',
+    'output_chunks': 'Chunks relayed to debugger clients',
+    'completions': 'Tab completions requested',
+}
+
+
+class SessionStats:
+    """
+    Metrics of a single debugging session.
+    Times are measured with time.perf_counter, except for started and ended, which are unix timestamps.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.ended: Optional[float] = None
+        self._start_counter = time.perf_counter()
+        self.prompt_latency: Optional[float] = None
+        self.stops = 0
+        self.stopped_seconds = 0.
+        self.max_stop_seconds = 0.
+        self._stop_start: Optional[float] = None
+        self.trace_events = 0
+        self.trace_seconds = 0.
+        self.relayed_bytes = {RELAYED_INPUT: 0, RELAYED_OUTPUT: 0}
+        self.relayed_chunks = {RELAYED_INPUT: 0, RELAYED_OUTPUT: 0}
+        self.completion_stats: Optional[CompletionStats] = None
+
+    def relay_tap(self, direction: str) -> Callable[[bytes], None]:
+        """ Return a Piping tap counting the chunks relayed in the given direction """
+        relayed_bytes, relayed_chunks = self.relayed_bytes, self.relayed_chunks
+
+        def tap(data: bytes):
+            relayed_bytes[direction] += len(data)
+            relayed_chunks[direction] += 1
+
+        return tap
+
+    def prompt_shown(self):
+        if self.prompt_latency is None:
+            self.prompt_latency = time.perf_counter() - self._start_counter
+
+    def stop_started(self):
+        self.stops += 1
+        self._stop_start = time.perf_counter()
+
+    def stop_ended(self):
+        if self._stop_start is None:
+            return
+        stop_time = time.perf_counter() - self._stop_start
+        self._stop_start = None
+        self.stopped_seconds += stop_time
+        self.max_stop_seconds = max(self.max_stop_seconds, stop_time)
+
+    def end(self):
+        self.stop_ended()
+        self.ended = time.time()
+
+    def current_stop(self) -> Optional[float]:
+        """ How long the program has been stopped at the prompt, or None if it isn't """
+        stop_start = self._stop_start
+        return None if stop_start is None else time.perf_counter() - stop_start
+
+    def counters(self) -> Dict[str, float]:
+        current_stop = self.current_stop() or 0.
+        return dict(
+            stops=self.stops,
+            stopped_seconds=self.stopped_seconds + current_stop,
+            trace_events=self.trace_events,
+            trace_seconds=self.trace_seconds,
+            input_bytes=self.relayed_bytes[RELAYED_INPUT],
+            input_chunks=self.relayed_chunks[RELAYED_INPUT],
+            output_bytes=self.relayed_bytes[RELAYED_OUTPUT],
+            output_chunks=self.relayed_chunks[RELAYED_OUTPUT],
+            completions=0 if self.completion_stats is None else self.completion_stats.count,
+        )
+
+    def max_stop(self) -> float:
+        current_stop = self.current_stop() or 0.
+        return max(self.max_stop_seconds, current_stop)
+
+    def as_dict(self) -> dict:
+        completion_stats = self.completion_stats
+        return dict(
+            started=self.started,
+            ended=self.ended,
+            connect_to_prompt_seconds=self.prompt_latency,
+            max_stop_seconds=self.max_stop(),
+            max_completion_seconds=None if completion_stats is None else completion_stats.max_latency,
+            **self.counters(),
+        )
+
+    def __str__(self):
+        counters = self.counters()
+        prompt_latency = '-' if self.prompt_latency is None else f'{self.prompt_latency * 1000:.1f}ms'
+        return f'Stopped {counters["stops"]} time(s), for {counters["stopped_seconds"]:.3f}s, ' \
+               f'longest stop {self.max_stop():.3f}s\n' \
+               f'Handled {counters["trace_events"]} trace event(s) in {counters["trace_seconds"]:.3f}s\n' \
+               f'Relayed {counters["input_bytes"]} bytes in {counters["input_chunks"]} chunk(s) from the client, ' \
+               f'{counters["output_bytes"]} bytes in {counters["output_chunks"]} chunk(s) to it\n' \
+               f'Connect to prompt latency: {prompt_latency}'
+
+
+class _Registry:
+    """ The stats of the current or last session, and the totals of the sessions that ended """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions = 0
+        self.current: Optional[SessionStats] = None
+        self.last: Optional[SessionStats] = None
+        self.ended_totals = dict.fromkeys(COUNTERS, 0)
+        self.max_stop_seconds = 0.
+
+    def session_started(self, session_stats: SessionStats):
+        with self.lock:
+            self.sessions += 1
+            self.current = session_stats
+
+    def session_ended(self, session_stats: SessionStats):
+        session_stats.end()
+        with self.lock:
+            for name, value in session_stats.counters().items():
+                self.ended_totals[name] += value
+            self.max_stop_seconds = max(self.max_stop_seconds, session_stats.max_stop())
+            if self.current is session_stats:
+                self.current = None
+            self.last = session_stats
+
+    def stats(self) -> dict:
+        with self.lock:
+            totals = dict(self.ended_totals)
+            max_stop_seconds = self.max_stop_seconds
+            if self.current is not None:
+                for name, value in self.current.counters().items():
+                    totals[name] += value
+                max_stop_seconds = max(max_stop_seconds, self.current.max_stop())
+            session = self.current or self.last
+            return dict(sessions=self.sessions, active=self.current is not None,
+                        session=None if session is None else session.as_dict(),
+                        totals=dict(totals, max_stop_seconds=max_stop_seconds))
+
+
+_registry = _Registry()
+session_started = _registry.session_started
+session_ended = _registry.session_ended
+
+
+def stats() -> dict:
+    """
+    Return the metrics of the current debugging session, or the last one if none is active,
+    and the totals of all sessions in this process.
+    """
+    return _registry.stats()
+
+
+def format_prometheus(stats_dict: dict) -> str:
+    """ Format stats() in the prometheus text exposition format """
+    totals = stats_dict['totals']
+    session = stats_dict['session'] or {}
+    lines = []
+
+    def add_metric(name: str, metric_type: str, help_text: str, value):
+        if value is None:
+            return
+        lines.extend([f'# HELP madbg_{name} {help_text}', f'# TYPE madbg_{name} {metric_type}', f'madbg_{name} {value}'])
+
+    add_metric('sessions_total', 'counter', 'Debugging sessions started', stats_dict['sessions'])
+    add_metric('session_active', 'gauge', 'Whether a debugging session is active', int(stats_dict['active']))
+    for name, help_text in COUNTERS.items():
+        add_metric(f'{name}_total', 'counter', help_text, totals[name])
+    add_metric('max_stop_seconds', 'gauge', 'Longest time a debugged program was stopped at the debugger prompt',
+               totals['max_stop_seconds'])
+    add_metric('connect_to_prompt_seconds', 'gauge',
+               'Time from a client connecting to the prompt being shown, in the current or last session',
+               session.get('connect_to_prompt_seconds'))
+    return '\n'.join(lines) + '\n'
+
+
+def dump_stats(path: Optional[str] = None, output_format: str = 'json') -> str:
+    """
+    Return stats() as json or in the prometheus text format, and write it to path if given.
+    """
+    stats_dict = stats()
+    if output_format == 'json':
+        dump = json.dumps(stats_dict, indent=2)
+    elif output_format == 'prometheus':
+        dump = format_prometheus(stats_dict)
+    else:
+        raise ValueError(f'Unknown stats format: {output_format!r}')
+    if path is not None:
+        with open(path, 'w') as file:
+            file.write(dump)
+    return dump
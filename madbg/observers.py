@@ -0,0 +1,113 @@
+import os
+import socket
+from asyncio import TimerHandle
+from typing import Dict, NamedTuple
+
+from .communication import Piping, unpack_message, set_nonblocking
+from .consts import OBSERVER_HANDSHAKE_TIMEOUT, OBSERVER_HANDSHAKE_MAX_SIZE
+from .options import SessionOptions
+
+
+class _Handshake(NamedTuple):
+    sock: socket.socket
+    buffer: bytearray
+    timeout: TimerHandle
+
+
+class SessionObservers:
+    """
+    Accepts read-only clients on the session's server socket, and fans the session's output out to them.
+    Each observer has its own bounded buffer in the piping, and is disconnected if it falls behind,
+    so watching a session never slows down the client driving it or the debugged program.
+    Everything but close() runs in the piping's loop.
+    """
+
+    def __init__(self, piping: Piping, server_socket: socket.socket, output_fd: int, options: SessionOptions):
+        self.piping = piping
+        self.server_socket = server_socket
+        self.output_fd = output_fd
+        self.options = options
+        self.observers: Dict[int, socket.socket] = {}
+        self.handshakes: Dict[int, _Handshake] = {}
+        self.server_socket.setblocking(False)
+        self.piping.loop.add_reader(self.server_socket.fileno(), self._accept)
+
+    def _accept(self):
+        try:
+            sock, address = self.server_socket.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        # The client's terminal data is read as it arrives, so a client that doesn't send it can't stall the loop
+        sock.setblocking(False)
+        fd = sock.fileno()
+        timeout = self.piping.loop.call_later(OBSERVER_HANDSHAKE_TIMEOUT, self._end_handshake, fd)
+        self.handshakes[fd] = _Handshake(sock, bytearray(), timeout)
+        self.piping.loop.add_reader(fd, self._read_handshake, fd)
+
+    def _read_handshake(self, fd: int):
+        handshake = self.handshakes[fd]
+        try:
+            data = handshake.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        handshake.buffer.extend(data)
+        try:
+            term_data = unpack_message(handshake.buffer)
+        except ValueError:
+            self._end_handshake(fd)
+            return
+        if term_data is None:
+            if not data or len(handshake.buffer) > OBSERVER_HANDSHAKE_MAX_SIZE:
+                self._end_handshake(fd)
+            return
+        sock = self._end_handshake(fd, close=False)
+        if not isinstance(term_data, dict) or not term_data.get('observe'):
+            self._reject(sock, 'Another client is already driving this session, use --observe to watch it')
+        elif len(self.observers) >= self.options.max_observers:
+            self._reject(sock, 'Too many observers are already watching this session')
+        else:
+            self._add_observer(sock)
+
+    def _end_handshake(self, fd: int, close: bool = True) -> socket.socket:
+        handshake = self.handshakes.pop(fd)
+        handshake.timeout.cancel()
+        self.piping.loop.remove_reader(fd)
+        if close:
+            handshake.sock.close()
+        return handshake.sock
+
+    @staticmethod
+    def _reject(sock: socket.socket, reason: str):
+        try:
+            sock.sendall(f'{reason}\r\n'.encode())
+        except OSError:
+            pass
+        sock.close()
+
+    def _add_observer(self, sock: socket.socket):
+        fd = sock.fileno()
+        set_nonblocking(fd)
+        self.observers[fd] = sock
+        try:
+            os.write(fd, b'Observing debugging session (read-only), press Ctrl-C to stop\r\n')
+        except OSError:
+            pass
+        self.piping.add_pipe(self.output_fd, fd, buffer_limit=self.options.observer_buffer_size,
+                             drop_callback=self._remove_observer)
+        self.piping.add_reader(fd)
+
+    def _remove_observer(self, fd: int):
+        sock = self.observers.pop(fd, None)
+        if sock is not None:
+            sock.close()
+
+    def close(self):
+        for handshake in self.handshakes.values():
+            handshake.timeout.cancel()
+            handshake.sock.close()
+        self.handshakes.clear()
+        for sock in self.observers.values():
+            sock.close()
+        self.observers.clear()
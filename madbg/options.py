@@ -0,0 +1,39 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from .consts import DEFAULT_OBSERVER_BUFFER_SIZE, DEFAULT_COMPLETION_BUDGET, DEFAULT_HEARTBEAT_INTERVAL, \
+    DEFAULT_STACK_PAGE_SIZE
+
+
+@dataclass(frozen=True)
+class SessionOptions:
+    """
+    Options for a debugging session, accepted by all the functions that start a debugger.
+
+    :param max_observers: How many read-only clients may watch the session alongside the client driving it.
+        When non-zero, the server socket is kept open during the session to accept them.
+    :param observer_buffer_size: How many bytes of output may be pending for an observer before it is
+        disconnected, so a slow observer can never hold back the session.
+    :param record_path: If given, the session's input and output are recorded to this file,
+        to be replayed with `madbg replay`. Sessions recorded to an existing file are appended to it.
+    :param completion_budget: How many seconds tab completion may hold the prompt. When it runs out,
+        the completions found so far are shown, with the matching names of the current frame.
+    :param idle_timeout: If given, the session is detached when the program was stopped at the prompt
+        and the client sent nothing for this many seconds. Detaching clears all breakpoints,
+        resumes the program and ends the session, so a forgotten session can't hold the program.
+    :param max_stop_time: If given, the session is detached when the program was stopped at the prompt
+        for this many seconds, even if the client is active.
+    :param heartbeat_interval: How many seconds the connection may be quiet before the client is probed,
+        to detach the session if it doesn't answer. None disables the probes.
+        The session is always detached when the client disconnects.
+    :param stack_page_size: How many frames around the current one `where` shows, or None to show all of them.
+        Recursion is collapsed either way.
+    """
+    max_observers: int = 0
+    observer_buffer_size: int = DEFAULT_OBSERVER_BUFFER_SIZE
+    record_path: Optional[str] = None
+    completion_budget: float = DEFAULT_COMPLETION_BUDGET
+    idle_timeout: Optional[float] = None
+    max_stop_time: Optional[float] = None
+    heartbeat_interval: Optional[float] = DEFAULT_HEARTBEAT_INTERVAL
+    stack_page_size: Optional[int] = DEFAULT_STACK_PAGE_SIZE
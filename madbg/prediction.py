@@ -0,0 +1,99 @@
+import re
+import time
+from typing import Optional
+
+from .consts import PREDICTION_MIN_RTT, PREDICTION_MAX_PENDING
+
+# Weight of a new echo round trip measurement in the smoothed round trip time
+RTT_SMOOTHING = 0.125
+# Escape sequences that don't move the cursor or change the screen's text - text attributes and private modes
+# (like hiding the cursor), which prompt_toolkit wraps around every echo
+NEUTRAL_SEQUENCE = re.compile(rb'\x1b\[(?:[0-9;]*m|\?[0-9;]*[hl])')
+
+
+def erase(count: int) -> bytes:
+    """ Erase count characters before the cursor, leaving it where the first of them was. """
+    return b'\b' * count + b' ' * count + b'\b' * count
+
+
+class EchoPredictor:
+    """
+    Shows the echo of printable keys typed at the client before the debugger echoes them back, like mosh does.
+
+    The debugger's output is compared with the predicted echo: matching output is already on the screen so it is
+    swallowed, and on a mismatch the shown predictions are erased before the output is written.
+    This keeps the cursor where the debugger expects it whenever its output is written.
+    Predictions are only shown while the echo round trip is slow enough to be noticed, and are hidden after
+    a mismatch until the echo is predicted correctly again.
+    Control keys (enter, arrows, tab...) have effects we can't predict, so prediction is paused after them
+    until the debugger responds.
+    """
+
+    def __init__(self, min_rtt: float = PREDICTION_MIN_RTT):
+        self.min_rtt = min_rtt
+        self.rtt: Optional[float] = None
+        self.pending = bytearray()
+        self.pending_since: Optional[float] = None
+        self.displayed = 0
+        self.confident = True
+        self.paused = False
+
+    def _should_display(self) -> bool:
+        return self.confident and self.rtt is not None and self.rtt >= self.min_rtt \
+            and self.displayed == len(self.pending)
+
+    def on_input(self, data: bytes) -> bytes:
+        """ Return the predicted echo of data that should be shown right away. """
+        echo = bytearray()
+        for byte in data:
+            if self.paused or not 0x20 <= byte < 0x7f or len(self.pending) >= PREDICTION_MAX_PENDING:
+                self.paused = True
+                continue
+            if not self.pending:
+                self.pending_since = time.monotonic()
+            if self._should_display():
+                echo.append(byte)
+                self.displayed += 1
+            self.pending.append(byte)
+        return bytes(echo)
+
+    def _measure_rtt(self):
+        rtt = time.monotonic() - self.pending_since
+        self.rtt = rtt if self.rtt is None else (1 - RTT_SMOOTHING) * self.rtt + RTT_SMOOTHING * rtt
+        self.pending_since = time.monotonic() if self.pending else None
+
+    def on_output(self, data: bytes) -> bytes:
+        """ Return what should be written to the terminal instead of data, given the shown predictions. """
+        output = bytearray()
+        matched = 0
+        position = 0
+        while position < len(data):
+            sequence = NEUTRAL_SEQUENCE.match(data, position)
+            if sequence:
+                output += sequence.group()
+                position = sequence.end()
+                continue
+            if not self.pending or data[position] != self.pending[0]:
+                break
+            if self.displayed:
+                # Already on the screen
+                self.displayed -= 1
+            else:
+                output.append(data[position])
+            del self.pending[0]
+            position += 1
+            matched += 1
+        if matched:
+            self.confident = True
+            self._measure_rtt()
+        if position < len(data):
+            # The debugger did something other than echoing our prediction
+            if self.pending:
+                output += erase(self.displayed)
+                self.pending.clear()
+                self.pending_since = None
+                self.displayed = 0
+                self.confident = False
+            self.paused = False
+            output += data[position:]
+        return bytes(output)
@@ -0,0 +1,153 @@
+import os
+import struct
+import threading
+import time
+from bisect import bisect_right
+from collections import deque
+from typing import Callable, Iterator, List, Tuple, BinaryIO, Optional
+
+from .consts import RECORDING_FLUSH_INTERVAL, RECORDING_INDEX_INTERVAL
+
+RECORDING_MAGIC = b'MADBGREC1'
+INDEX_SUFFIX = '.idx'
+# timestamp (seconds into the recording), direction, data length
+RECORD_HEADER = struct.Struct('<dBI')
+# timestamp, offset of the first record at or after it
+INDEX_ENTRY = struct.Struct('<dQ')
+
+INPUT = 0
+OUTPUT = 1
+
+
+class SessionRecorder:
+    """
+    Records the bytes relayed in a session to an append-only file, along with a sparse index for seeking.
+    The relay only appends chunks to a queue, and a separate thread writes them in batches,
+    so recording doesn't add file IO to the relay.
+    Timestamps are taken from a monotonic clock, so they always increase, even when the wall clock is set back.
+    A session appended to an existing recording is timestamped from where the recording ended.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.pending = deque()
+        self.closed = threading.Event()
+        self.file = open(path, 'ab')
+        self.index_file = open(path + INDEX_SUFFIX, 'ab')
+        if self.file.tell():
+            end_time = SessionRecording(path).end_time()
+        else:
+            self.file.write(RECORDING_MAGIC)
+            end_time = None
+        self.start_time = time.monotonic() - (end_time or 0.)
+        self.last_indexed = None
+        self.thread = threading.Thread(target=self._write_pending_periodically, name='madbg-recorder', daemon=True)
+        self.thread.start()
+
+    def tap(self, direction: int) -> Callable[[bytes], None]:
+        """ Return a callback recording data relayed in the given direction. """
+        return lambda data: self.pending.append((time.monotonic() - self.start_time, direction, data))
+
+    def _write_pending(self):
+        while self.pending:
+            timestamp, direction, data = self.pending.popleft()
+            if self.last_indexed is None or timestamp - self.last_indexed >= RECORDING_INDEX_INTERVAL:
+                self.index_file.write(INDEX_ENTRY.pack(timestamp, self.file.tell()))
+                self.last_indexed = timestamp
+            self.file.write(RECORD_HEADER.pack(timestamp, direction, len(data)))
+            self.file.write(data)
+        self.file.flush()
+        self.index_file.flush()
+
+    def _write_pending_periodically(self):
+        while not self.closed.wait(RECORDING_FLUSH_INTERVAL):
+            self._write_pending()
+
+    def close(self):
+        self.closed.set()
+        self.thread.join()
+        self._write_pending()
+        self.file.close()
+        self.index_file.close()
+
+
+class SessionRecording:
+    """ Reads a recording made by SessionRecorder. """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = self._read_index()
+
+    def _read_index(self) -> List[Tuple[float, int]]:
+        try:
+            with open(self.path + INDEX_SUFFIX, 'rb') as index_file:
+                data = index_file.read()
+        except FileNotFoundError:
+            return []
+        # Ignore a partially written last entry
+        data = data[:len(data) - len(data) % INDEX_ENTRY.size]
+        return list(INDEX_ENTRY.iter_unpack(data))
+
+    def _seek(self, file: BinaryIO, start_time: Optional[float]):
+        """ Seek to the last indexed record before start_time. """
+        file.seek(len(RECORDING_MAGIC))
+        if start_time is not None and self.index:
+            i = bisect_right(self.index, (start_time, float('inf')))
+            if i:
+                file.seek(self.index[i - 1][1])
+
+    def start_time(self) -> Optional[float]:
+        for timestamp, _, _ in self.records():
+            return timestamp
+        return None
+
+    def end_time(self) -> Optional[float]:
+        timestamp = None
+        for timestamp, _, _ in self.records(self.index[-1][0] if self.index else None):
+            pass
+        return timestamp
+
+    def records(self, start_time: Optional[float] = None) -> Iterator[Tuple[float, int, bytes]]:
+        """ Yield the recorded (timestamp, direction, data) tuples, starting at start_time if given. """
+        with open(self.path, 'rb') as file:
+            if file.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+                raise ValueError(f'{self.path} is not a madbg recording')
+            self._seek(file, start_time)
+            while True:
+                header = file.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                timestamp, direction, length = RECORD_HEADER.unpack(header)
+                data = file.read(length)
+                if len(data) < length:
+                    return
+                if start_time is None or timestamp >= start_time:
+                    yield timestamp, direction, data
+
+    def replay(self, out_fd: int, speed: float = 1., start: float = 0., max_idle: Optional[float] = None,
+               directions=(OUTPUT,)):
+        """
+        Write the recorded data to out_fd, keeping the recorded timing.
+
+        :param speed: Playback speed multiplier.
+        :param start: Seconds from the beginning of the recording to start from.
+        :param max_idle: If given, longer pauses in the recording are shortened to this many seconds.
+        """
+        if speed <= 0:
+            raise ValueError('The playback speed must be positive')
+        first_timestamp = self.start_time()
+        if first_timestamp is None:
+            return
+        last_timestamp = None
+        for timestamp, direction, data in self.records(first_timestamp + start if start else None):
+            if direction not in directions:
+                continue
+            if last_timestamp is not None:
+                # Recordings timestamped with the wall clock may go back in time
+                delay = max(timestamp - last_timestamp, 0)
+                if max_idle is not None:
+                    delay = min(delay, max_idle)
+                time.sleep(delay / speed)
+            last_timestamp = timestamp
+            while data:
+                data = data[os.write(out_fd, data):]
@@ -0,0 +1,62 @@
+import importlib.util
+import os
+import site
+import sys
+import sysconfig
+from typing import List, Optional, Sequence
+
+
+def get_script_dir(python_file: str, run_as_module: bool) -> Optional[str]:
+    """ Return the directory of a script, or the one containing the top level package of a module """
+    if not run_as_module:
+        return os.path.dirname(os.path.abspath(python_file))
+    try:
+        spec = importlib.util.find_spec(python_file.partition('.')[0])
+    except (ImportError, ValueError):
+        return None
+    if spec is None:
+        return None
+    if spec.submodule_search_locations:
+        return os.path.dirname(os.path.abspath(list(spec.submodule_search_locations)[0]))
+    if spec.origin is None or not os.path.isabs(spec.origin):
+        return None
+    return os.path.dirname(spec.origin)
+
+
+def _get_installation_dirs() -> List[str]:
+    paths = sysconfig.get_paths()
+    dirs = [paths[name] for name in ('stdlib', 'platstdlib', 'purelib', 'platlib')]
+    # Also packages installed with --user, or to other site directories, which may be under the home directory
+    if hasattr(site, 'getsitepackages'):
+        # Missing in the site module of old virtualenvs
+        dirs.extend(site.getsitepackages())
+    dirs.append(site.getusersitepackages())
+    return [os.path.abspath(dir_path) for dir_path in dirs]
+
+
+def _is_under(path: str, dirs: Sequence[str]) -> bool:
+    return any(os.path.commonpath([path, dir_path]) == dir_path for dir_path in dirs)
+
+
+def unload_modules(dirs: Sequence[str] = (), names: Sequence[str] = ()) -> List[str]:
+    """
+    Remove modules from sys.modules, so importing them again runs them again, and return their names.
+    The removed modules are the ones with files under one of dirs, and the ones named in names or in packages named
+    in names. Installed modules are kept even if they are under dirs, like ones in a virtualenv inside a project.
+    """
+    dirs = [os.path.abspath(dir_path) for dir_path in dirs]
+    installation_dirs = _get_installation_dirs()
+    unloaded = []
+    for name, module in list(sys.modules.items()):
+        if name.partition('.')[0] == __name__.partition('.')[0]:
+            continue
+        if not any(name == package or name.startswith(f'{package}.') for package in names):
+            path = getattr(module, '__file__', None)
+            if not dirs or not path:
+                continue
+            path = os.path.abspath(path)
+            if not _is_under(path, dirs) or _is_under(path, installation_dirs):
+                continue
+        del sys.modules[name]
+        unloaded.append(name)
+    return unloaded
@@ -0,0 +1,131 @@
+from bisect import bisect_left
+from typing import Hashable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from .consts import STACK_MIN_REPEATS, STACK_MAX_REPEAT_PERIOD
+
+
+class Repeat(NamedTuple):
+    """ Frames start to stop (exclusive) repeat the period frames before them """
+    start: int
+    stop: int
+    period: int
+
+    @property
+    def times(self) -> int:
+        return (self.stop - self.start) // self.period
+
+
+def _longest_repeat(keys: Sequence[Hashable], start: int, max_period: int) -> Tuple[int, int]:
+    """ Return the period of the pattern starting at start which repeats over the most frames, and its repeat count """
+    best_period, best_repeats = 1, 1
+    for period in range(1, max_period + 1):
+        if start + 2 * period > len(keys):
+            break
+        pattern = keys[start:start + period]
+        repeats = 1
+        while keys[start + repeats * period:start + (repeats + 1) * period] == pattern:
+            repeats += 1
+        if period * repeats > best_period * best_repeats:
+            best_period, best_repeats = period, repeats
+    return best_period, best_repeats
+
+
+def collapse_repeats(keys: Sequence[Hashable], min_repeats: int = STACK_MIN_REPEATS,
+                     max_period: int = STACK_MAX_REPEAT_PERIOD) -> List[Union[int, Repeat]]:
+    """
+    Collapse consecutive repetitions of the same pattern of keys, like the frames of a recursion.
+    Return the positions of the keys to show, where the first repetition of each pattern
+    repeated at least min_repeats times is followed by a Repeat of the rest.
+    """
+    keys = list(keys)
+    entries = []
+    position = 0
+    while position < len(keys):
+        period, repeats = _longest_repeat(keys, position, max_period)
+        if repeats < min_repeats:
+            entries.append(position)
+            position += 1
+            continue
+        entries.extend(range(position, position + period))
+        position += period * repeats
+        entries.append(Repeat(position - period * (repeats - 1), position, period))
+    return entries
+
+
+class _Entry(NamedTuple):
+    first: int
+    last: int
+    # None for a frame to show
+    note: Optional[str]
+
+
+def _collapsed_entries(keys: Sequence[Hashable], indices: Sequence[int]) -> List[_Entry]:
+    entries = []
+    for entry in collapse_repeats([keys[i] for i in indices]):
+        if isinstance(entry, Repeat):
+            note = f'    [... previous {entry.period} frame(s) repeated {entry.times} more time(s)]'
+            entries.append(_Entry(indices[entry.start], indices[entry.stop - 1], note))
+        else:
+            entries.append(_Entry(indices[entry], indices[entry], None))
+    return entries
+
+
+def _take_frames(entries: Sequence[_Entry], count: int) -> List[_Entry]:
+    """ Return the first entries, up to the count-th frame """
+    taken = []
+    for entry in entries:
+        if count == 0:
+            break
+        if entry.note is None:
+            count -= 1
+        taken.append(entry)
+    return taken
+
+
+def _frame_count(entries: Sequence[_Entry]) -> int:
+    return sum(entry.note is None for entry in entries)
+
+
+def _add_skipped(rows: List[Union[int, str]], skipped: int):
+    if skipped:
+        rows.append(f'    [... skipping {skipped} hidden frame(s)]')
+
+
+def summarize_stack(keys: Sequence[Hashable], hidden: Sequence[bool], current: int,
+                    page_size: Optional[int] = None) -> List[Union[int, str]]:
+    """
+    Summarize a stack for display, so a deep stack costs about as much to show as a shallow one.
+    Hidden frames are skipped and repeated patterns of frames (by their keys) are collapsed, except for the current one.
+    If page_size is given, only up to that many frames around the current one are shown.
+
+    :return: The indices of the frames to show, and the notes to show between them.
+    """
+    visible = [index for index, is_hidden in enumerate(hidden) if not is_hidden or index == current]
+    position = bisect_left(visible, current)
+    older = _collapsed_entries(keys, visible[:position])
+    newer = _collapsed_entries(keys, visible[position + 1:])
+    older_paged = newer_paged = False
+    if page_size is not None:
+        newer_count = max((page_size - 1) // 2, page_size - 1 - _frame_count(older))
+        older_count = max(page_size - 1 - newer_count, page_size - 1 - _frame_count(newer))
+        paged_older = _take_frames(older[::-1], older_count)[::-1]
+        paged_newer = _take_frames(newer, newer_count)
+        older_paged, newer_paged = len(paged_older) < len(older), len(paged_newer) < len(newer)
+        older, newer = paged_older, paged_newer
+    entries = [*older, _Entry(current, current, None), *newer]
+
+    rows = []
+    previous_last = -1
+    if older_paged:
+        rows.append(f"    [... {entries[0].first} older frame(s), 'where all' shows them]")
+        previous_last = entries[0].first - 1
+    for entry in entries:
+        _add_skipped(rows, entry.first - previous_last - 1)
+        rows.append(entry.first if entry.note is None else entry.note)
+        previous_last = entry.last
+    newer_frames = len(keys) - 1 - previous_last
+    if newer_paged:
+        rows.append(f"    [... {newer_frames} newer frame(s), 'where all' shows them]")
+    else:
+        _add_skipped(rows, newer_frames)
+    return rows
@@ -0,0 +1,133 @@
+import sys
+from inspect import CO_GENERATOR, CO_COROUTINE, CO_ASYNC_GENERATOR
+from types import FrameType
+from typing import Any, Callable, Optional
+
+from .utils import claim_monitoring_tool
+
+GENERATOR_AND_COROUTINE_FLAGS = CO_GENERATOR | CO_COROUTINE | CO_ASYNC_GENERATOR
+
+
+def is_generator_or_coroutine(frame: FrameType) -> bool:
+    return bool(frame.f_code.co_flags & GENERATOR_AND_COROUTINE_FLAGS)
+
+
+def step_calls_filter(debugger) -> Callable:
+    """
+    Return a global trace function for stepping over or out of a frame, which doesn't trace calls into other frames.
+    Without breakpoints the debugger never stops in them anyway, but handling each call walks the stack in IPython.
+    Once stepping goes on anywhere, like after the stepped frame returns, calls are passed to the debugger again.
+    """
+    trace_dispatch = debugger.trace_dispatch
+
+    def filter_calls(frame, event, arg):
+        if debugger.stopframe is None:
+            return trace_dispatch(frame, event, arg)
+        return None
+
+    return filter_calls
+
+
+def line_skipping_tracer(debugger, lineno: int) -> Callable:
+    """
+    Return a local trace function for running a frame until it reaches a line,
+    which doesn't pass the lines before it to the debugger.
+    """
+    trace_dispatch = debugger.trace_dispatch
+
+    def trace_lines(frame, event, arg):
+        running_until = debugger.stopframe is frame and debugger.stoplineno == lineno
+        if event == 'line' and running_until and frame.f_lineno < lineno:
+            return trace_lines
+        trace_function = trace_dispatch(frame, event, arg)
+        if event == 'exception' and running_until:
+            return trace_lines
+        return trace_function
+
+    return trace_lines
+
+
+class StepMonitor:
+    """
+    Runs the program until a stepped frame reaches a line or returns, using sys.monitoring.
+    Only the stepped code object has line and return events, so callees run at full speed,
+    and lines before the target line are disabled the first time they run.
+    When the target is reached, the event is passed to on_target as a trace function event.
+    """
+    TOOL_NAME = 'madbg-stepping'
+
+    def __init__(self, on_target: Callable[[FrameType, str, Any], None]):
+        self.on_target = on_target
+        self.frame: Optional[FrameType] = None
+        self.stoplineno: Optional[int] = None
+        self.tool_id: Optional[int] = None
+
+    @property
+    def running(self) -> bool:
+        return self.tool_id is not None
+
+    def start(self, frame: FrameType, stoplineno: Optional[int]) -> bool:
+        """
+        Start monitoring the frame. Return False if monitoring is in use.
+
+        :param stoplineno: Stop when the frame reaches a line greater or equal to this one,
+                           or only when it returns if None.
+        """
+        monitoring = sys.monitoring
+        tool_id = self.tool_id = claim_monitoring_tool(self.TOOL_NAME)
+        if tool_id is None:
+            return False
+        self.frame = frame
+        self.stoplineno = stoplineno
+        events = monitoring.events
+        monitoring.register_callback(tool_id, events.LINE, self._on_line)
+        monitoring.register_callback(tool_id, events.PY_RETURN, self._on_return)
+        monitoring.register_callback(tool_id, events.PY_UNWIND, self._on_unwind)
+        monitoring.register_callback(tool_id, events.RAISE, self._on_raise)
+        # Lines disabled by a previous step may be the target of this one
+        monitoring.restart_events()
+        local_events = events.PY_RETURN if stoplineno is None else events.LINE | events.PY_RETURN
+        monitoring.set_local_events(tool_id, frame.f_code, local_events)
+        # Exceptions can only be monitored globally
+        monitoring.set_events(tool_id, events.PY_UNWIND if stoplineno is None else events.PY_UNWIND | events.RAISE)
+        return True
+
+    def stop(self):
+        if not self.running:
+            return
+        monitoring = sys.monitoring
+        tool_id = self.tool_id
+        monitoring.set_events(tool_id, 0)
+        monitoring.set_local_events(tool_id, self.frame.f_code, 0)
+        events = monitoring.events
+        for event in (events.LINE, events.PY_RETURN, events.PY_UNWIND, events.RAISE):
+            monitoring.register_callback(tool_id, event, None)
+        monitoring.free_tool_id(tool_id)
+        self.tool_id = None
+        self.frame = None
+
+    def _reach(self, frame: FrameType, event: str, arg: Any):
+        self.stop()
+        self.on_target(frame, event, arg)
+
+    def _on_line(self, code, line_number):
+        if line_number < self.stoplineno:
+            return sys.monitoring.DISABLE
+        frame = sys._getframe(1)
+        if frame is self.frame:
+            self._reach(frame, 'line', None)
+
+    def _on_return(self, code, instruction_offset, retval):
+        frame = sys._getframe(1)
+        if frame is self.frame:
+            self._reach(frame, 'return', retval)
+
+    def _on_unwind(self, code, instruction_offset, exception):
+        frame = sys._getframe(1)
+        if frame is self.frame:
+            self._reach(frame, 'return', None)
+
+    def _on_raise(self, code, instruction_offset, exception):
+        frame = sys._getframe(1)
+        if frame is self.frame and frame.f_lineno >= self.stoplineno:
+            self._reach(frame, 'exception', (type(exception), exception, exception.__traceback__))
@@ -12,6 +12,13 @@ from typing import Optional
 import termios
 
 
+def get_term_attrs(fd: int) -> list:
+    """ Like termios.tcgetattr, but with the control characters as ints, so the attributes can be sent as JSON """
+    attrs = termios.tcgetattr(fd)
+    attrs[-1] = [ord(char) if isinstance(char, bytes) else char for char in attrs[-1]]
+    return attrs
+
+
 def is_session_leader():
     return os.getsid(0) == os.getpid()
 
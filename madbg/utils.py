@@ -4,7 +4,7 @@ import threading
 from collections import defaultdict
 from concurrent.futures.thread import ThreadPoolExecutor
 from contextlib import contextmanager, ExitStack
-from typing import Dict, Any, Set
+from typing import Dict, Any, Set, Optional
 
 
 @contextmanager
@@ -51,3 +51,19 @@ def opposite_dict(dict_: Dict[Any, Set[Any]]) -> Dict[Any, Set[Any]]:
         for value in values:
             opposite[value].add(key)
     return opposite
+
+
+def claim_monitoring_tool(name: str) -> Optional[int]:
+    """
+    Claim a free sys.monitoring tool id, preferring the one reserved for debuggers.
+    Return None if there is none free. The caller is responsible for freeing it.
+    """
+    monitoring = sys.monitoring
+    # Ids 3 and 4 have no designated use
+    for tool_id in (monitoring.DEBUGGER_ID, 3, 4):
+        try:
+            monitoring.use_tool_id(tool_id, name)
+        except ValueError:
+            continue
+        return tool_id
+    return None
@@ -0,0 +1,95 @@
+import socket
+import threading
+import time
+from typing import Callable, Optional
+
+from .communication import Piping
+from .consts import HEARTBEAT_PROBES, WATCHDOG_CHECK_INTERVAL
+from .metrics import SessionStats
+from .options import SessionOptions
+
+
+def enable_heartbeats(sock_fd: int, interval: float):
+    """
+    Make the kernel probe the peer of a TCP socket after it was quiet for interval seconds,
+    and fail the socket if HEARTBEAT_PROBES probes in a row, or data sent to the peer, go unanswered.
+    Does nothing for other sockets.
+    """
+    seconds = max(1, int(interval))
+    sock = socket.fromfd(sock_fd, socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, True)
+        for option, value in (('TCP_KEEPIDLE', seconds), ('TCP_KEEPINTVL', seconds),
+                              ('TCP_KEEPCNT', HEARTBEAT_PROBES),
+                              ('TCP_USER_TIMEOUT', seconds * (HEARTBEAT_PROBES + 1) * 1000)):
+            if hasattr(socket, option):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+    except OSError:
+        pass
+    finally:
+        sock.close()
+
+
+class SessionWatchdog:
+    """
+    Detaches a debugging session no one attends, so a forgotten session can't hold the program stopped.
+    Trips when the client disconnects or stops answering heartbeats, when the client sent nothing for
+    options.idle_timeout seconds while the program was stopped, or when the program was stopped for
+    options.max_stop_time seconds.
+    When tripped, on_trip is called with the reason from the watchdog's thread every WATCHDOG_CHECK_INTERVAL
+    until the watchdog is closed, as the debugger may only be able to detach once the program stops.
+    Once the client is gone, the session's output is discarded, so writing it never blocks.
+    """
+
+    def __init__(self, piping: Piping, sock_fd: int, output_fd: int, stats: SessionStats, options: SessionOptions,
+                 on_trip: Callable[[str], None]):
+        self.piping = piping
+        self.output_fd = output_fd
+        self.stats = stats
+        self.options = options
+        self.on_trip = on_trip
+        self.reason: Optional[str] = None
+        self.last_input = time.perf_counter()
+        self._closed = threading.Event()
+        if options.heartbeat_interval is not None:
+            enable_heartbeats(sock_fd, options.heartbeat_interval)
+        piping.add_tap(sock_fd, self._on_input)
+        piping.add_pipe(output_fd, sock_fd, drop_callback=self._on_client_lost)
+        self._thread = threading.Thread(target=self._run, name='madbg-watchdog', daemon=True)
+        self._thread.start()
+
+    def _on_input(self, data: bytes):
+        self.last_input = time.perf_counter()
+
+    def _on_client_lost(self, sock_fd: int):
+        # Called from the piping's loop. Keep draining the output, as the session may still write to it
+        self.piping.drain(self.output_fd)
+        self.trip('the client disconnected')
+
+    def check(self) -> Optional[str]:
+        """ Return why the session should be detached, or None if it shouldn't """
+        stop_seconds = self.stats.current_stop()
+        if stop_seconds is None:
+            return None
+        options = self.options
+        if options.max_stop_time is not None and stop_seconds >= options.max_stop_time:
+            return f'the program was stopped for more than {options.max_stop_time}s'
+        idle_seconds = min(stop_seconds, time.perf_counter() - self.last_input)
+        if options.idle_timeout is not None and idle_seconds >= options.idle_timeout:
+            return f'the client was idle for more than {options.idle_timeout}s'
+        return None
+
+    def trip(self, reason: str):
+        if self.reason is None:
+            self.reason = reason
+        self.on_trip(self.reason)
+
+    def _run(self):
+        while not self._closed.wait(WATCHDOG_CHECK_INTERVAL):
+            reason = self.reason or self.check()
+            if reason is not None:
+                self.trip(reason)
+
+    def close(self):
+        self._closed.set()
+        self._thread.join()
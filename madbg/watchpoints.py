@@ -0,0 +1,239 @@
+import ast
+import copy
+import reprlib
+import sys
+import threading
+from types import CodeType, FrameType
+from typing import Any, Callable, Dict, Iterable, List, Set, Optional
+
+from .utils import claim_monitoring_tool
+
+MONITORING_AVAILABLE = hasattr(sys, 'monitoring')
+
+
+class EvaluationError:
+    """ The value of a watched expression that failed to evaluate """
+
+    def __init__(self, exception: Exception):
+        self.description = f'{type(exception).__name__}: {exception}'
+
+    def __eq__(self, other):
+        return isinstance(other, EvaluationError) and other.description == self.description
+
+    def __repr__(self):
+        return f'<{self.description}>'
+
+
+def _snapshot(value):
+    """ Copy builtin containers, so changes made to them in place are noticed """
+    if type(value) in (list, dict, set, bytearray):
+        return copy.copy(value)
+    return value
+
+
+def _equal(a, b) -> bool:
+    try:
+        return bool(a == b)
+    except Exception:
+        return a is b
+
+
+class Watchpoint:
+    """
+    An expression evaluated in the frame it was set in, and checked for changes.
+
+    Only frames running code that refers to one of the names in the expression are considered as possibly
+    changing its value - the frame the watchpoint was set in, code accessing a global or an attribute with a name
+    used in the expression, and closures of cell variables used in it.
+    Changes made through other names (e.g. through an alias of a watched list) are noticed the next time
+    a frame that could modify the value runs.
+    """
+
+    def __init__(self, number: int, expression: str, frame: FrameType, frame_locals: dict):
+        self.number = number
+        self.expression = expression
+        self.code = compile(expression, '<watch>', 'eval')
+        self.frame = frame
+        self.names, self.cell_names = self._find_names(expression, frame.f_code)
+        self.value = _snapshot(self._evaluate(frame_locals))
+        self.hits = 0
+
+    @staticmethod
+    def _find_names(expression: str, frame_code: CodeType):
+        names = set()
+        cell_names = set()
+        for node in ast.walk(ast.parse(expression, mode='eval')):
+            if isinstance(node, ast.Attribute):
+                names.add(node.attr)
+            elif isinstance(node, ast.Name):
+                if node.id in frame_code.co_cellvars or node.id in frame_code.co_freevars:
+                    cell_names.add(node.id)
+                elif node.id not in frame_code.co_varnames:
+                    names.add(node.id)
+        return names, cell_names
+
+    def _evaluate(self, frame_locals=None):
+        if frame_locals is None:
+            frame_locals = self.frame.f_locals
+        try:
+            return eval(self.code, self.frame.f_globals, frame_locals)
+        except Exception as e:
+            return EvaluationError(e)
+
+    def could_modify(self, code: CodeType) -> bool:
+        return code is self.frame.f_code or not self.names.isdisjoint(code.co_names) \
+            or not self.cell_names.isdisjoint(code.co_freevars) or not self.cell_names.isdisjoint(code.co_cellvars)
+
+    def changed(self) -> bool:
+        return not _equal(self.value, self._evaluate())
+
+    def update(self) -> str:
+        """ Store the new value of the expression, and return a description of the change. """
+        old_value, self.value = self.value, _snapshot(self._evaluate())
+        self.hits += 1
+        return f'Watchpoint {self.number}: {self.expression}\n' \
+               f'Old value = {reprlib.repr(old_value)}\n' \
+               f'New value = {reprlib.repr(self.value)}'
+
+    def __str__(self):
+        return f'{self.number:<4}watchpoint   {self.expression} = {reprlib.repr(self.value)}, ' \
+               f'changed {self.hits} time(s)'
+
+
+class Watchpoints:
+    """ The watchpoints of a debugger, with a cache of which code objects could modify them """
+
+    def __init__(self):
+        self.watchpoints: Dict[int, Watchpoint] = {}
+        self.next_number = 1
+        self._code_cache: Dict[CodeType, bool] = {}
+
+    def __bool__(self):
+        return bool(self.watchpoints)
+
+    def __iter__(self) -> Iterable[Watchpoint]:
+        return iter(list(self.watchpoints.values()))
+
+    def add(self, expression: str, frame: FrameType, frame_locals: dict) -> Watchpoint:
+        watchpoint = Watchpoint(self.next_number, expression, frame, frame_locals)
+        self.next_number += 1
+        self.watchpoints[watchpoint.number] = watchpoint
+        self._code_cache.clear()
+        return watchpoint
+
+    def remove(self, number: int):
+        del self.watchpoints[number]
+        self._code_cache.clear()
+
+    def clear(self):
+        self.watchpoints.clear()
+        self._code_cache.clear()
+
+    def watches_code(self, code: CodeType) -> bool:
+        try:
+            return self._code_cache[code]
+        except KeyError:
+            result = self._code_cache[code] = any(w.could_modify(code) for w in self.watchpoints.values())
+            return result
+
+    def call_filter(self, trace_function: Callable) -> Callable:
+        """
+        Return a global trace function, that traces only the calls of code that could modify a watched value,
+        using trace_function. Being called for every call in the program, it is kept as cheap as possible.
+        """
+        code_cache = self._code_cache
+        watches_code = self.watches_code
+
+        def filter_calls(frame, event, arg):
+            code = frame.f_code
+            watched = code_cache.get(code)
+            if watched is None:
+                watched = watches_code(code)
+            return trace_function if watched else None
+
+        return filter_calls
+
+    def any_changed(self) -> bool:
+        return any(w.changed() for w in self.watchpoints.values())
+
+    def update_changed(self) -> List[str]:
+        """ Update the watchpoints whose value has changed, and return descriptions of the changes """
+        return [w.update() for w in self if w.changed()]
+
+
+class WatchpointMonitor:
+    """
+    Checks watchpoints using sys.monitoring, so the program doesn't have to run under a trace function.
+    Each code object starting to run is checked once - if it could modify a watched value, line and return
+    events are enabled for it, and otherwise the check is disabled for it, costing nothing from then on.
+    Only the thread the monitor was started from is checked, like a trace function would.
+    """
+    TOOL_NAME = 'madbg'
+
+    def __init__(self, watchpoints: Watchpoints, on_change: Callable[[FrameType, str, Any], None]):
+        self.watchpoints = watchpoints
+        self.on_change = on_change
+        self.thread_id = None
+        self.watched_codes: Set[CodeType] = set()
+        self.tool_id: Optional[int] = None
+
+    @property
+    def running(self) -> bool:
+        return self.tool_id is not None
+
+    def start(self, frame: FrameType) -> bool:
+        """ Start monitoring, including the given frame and its callers. Return False if monitoring is in use. """
+        monitoring = sys.monitoring
+        tool_id = self.tool_id = claim_monitoring_tool(self.TOOL_NAME)
+        if tool_id is None:
+            return False
+        events = monitoring.events
+        monitoring.register_callback(tool_id, events.PY_START, self._on_start)
+        monitoring.register_callback(tool_id, events.LINE, self._on_line)
+        monitoring.register_callback(tool_id, events.PY_RETURN, self._on_return)
+        self.thread_id = threading.get_ident()
+        # Codes that were disabled by a previous run may be relevant to the current watchpoints
+        monitoring.restart_events()
+        monitoring.set_events(tool_id, events.PY_START)
+        while frame is not None:
+            if self.watchpoints.watches_code(frame.f_code):
+                self._watch_code(frame.f_code)
+            frame = frame.f_back
+        return True
+
+    def stop(self):
+        if not self.running:
+            return
+        monitoring = sys.monitoring
+        tool_id = self.tool_id
+        monitoring.set_events(tool_id, 0)
+        for code in self.watched_codes:
+            monitoring.set_local_events(tool_id, code, 0)
+        self.watched_codes.clear()
+        for event in (monitoring.events.PY_START, monitoring.events.LINE, monitoring.events.PY_RETURN):
+            monitoring.register_callback(tool_id, event, None)
+        monitoring.free_tool_id(tool_id)
+        self.tool_id = None
+
+    def _watch_code(self, code: CodeType):
+        events = sys.monitoring.events
+        sys.monitoring.set_local_events(self.tool_id, code, events.LINE | events.PY_RETURN)
+        self.watched_codes.add(code)
+
+    def _on_start(self, code, instruction_offset):
+        if self.watchpoints.watches_code(code):
+            self._watch_code(code)
+        return sys.monitoring.DISABLE
+
+    def _check(self, event: str, arg: Any):
+        """ When a watched value has changed, pass the event to on_change as a trace function event """
+        if threading.get_ident() == self.thread_id and self.watchpoints.any_changed():
+            frame = sys._getframe(2)
+            self.stop()
+            self.on_change(frame, event, arg)
+
+    def _on_line(self, code, line_number):
+        self._check('line', None)
+
+    def _on_return(self, code, instruction_offset, retval):
+        self._check('return', retval)
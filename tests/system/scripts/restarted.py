@@ -0,0 +1,11 @@
+import json
+import sys
+
+import restarted_helper
+
+# Modules outside the script's directory are kept across restarts
+runs = json.__dict__.setdefault('_madbg_test_runs', [])
+runs.append(restarted_helper.TOKEN)
+with open(sys.argv[-1], 'w') as output:
+    json.dump(runs, output)
+print(f'Ran {len(runs)} time(s)')
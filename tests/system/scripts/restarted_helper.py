@@ -0,0 +1,4 @@
+import os
+
+# Changes every time this module is imported
+TOKEN = os.urandom(8).hex()
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+
+import madbg
+from madbg.broker import Broker
+from madbg.consts import DEFAULT_IP
+from madbg.discovery import list_debuggers
+
+from .utils import run_in_process, run_script_in_process, run_client, find_free_port, JOIN_TIMEOUT
+
+
+def set_trace_on_connect_script(port) -> bool:
+    madbg.set_trace_on_connect(port=port)
+    conti = True
+    while conti:
+        time.sleep(0.1)
+    return True
+
+
+@contextmanager
+def run_broker(port):
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(Broker(DEFAULT_IP, port).serve())
+    thread = threading.Thread(target=loop.run_until_complete, args=(asyncio.gather(task, return_exceptions=True),))
+    thread.start()
+    try:
+        yield
+    finally:
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join()
+        loop.close()
+
+
+def find_registered_pid(port) -> int:
+    deadline = time.monotonic() + JOIN_TIMEOUT
+    while time.monotonic() < deadline:
+        for entry in list_debuggers():
+            if entry['port'] == port:
+                return entry['pid']
+        time.sleep(0.1)
+    raise TimeoutError()
+
+
+def test_broker_with_target(port, start_debugger_with_ctty):
+    broker_port = find_free_port()
+    with run_broker(broker_port):
+        with run_script_in_process(set_trace_on_connect_script, start_debugger_with_ctty, port) as script_result:
+            pid = find_registered_pid(port)
+            run_in_process(run_client, broker_port, b'conti = False\nc\n', target=pid).finish()
+    assert script_result.get(0)
+
+
+def test_broker_menu(port, start_debugger_with_ctty):
+    broker_port = find_free_port()
+    with run_broker(broker_port):
+        with run_script_in_process(set_trace_on_connect_script, start_debugger_with_ctty, port) as script_result:
+            pid = find_registered_pid(port)
+            output = run_in_process(run_client, broker_port, f'{pid}\nconti = False\nc\n'.encode()).finish().get(0)
+    assert b'Pick a number, or the pid of a listed process' in output
+    assert script_result.get(0)
@@ -0,0 +1,35 @@
+import madbg
+
+from .utils import run_in_process, run_script_in_process, connect_interactive_client, read_until_quiet, \
+    read_until, PROMPT_TIMEOUT, CONNECT_TIMEOUT
+
+# Sent by prompt_toolkit when a prompt starts, unlike the prompt itself, which is redrawn as keys are typed
+PROMPT_START = b'\x1b[?2004h'
+
+
+def define_after_set_trace_script(port):
+    # A budget long enough for the full completion, so the cached completions have to be dropped after next
+    madbg.set_trace(port=port, options=madbg.SessionOptions(completion_budget=CONNECT_TIMEOUT))
+    simbala_sortego = 'completed after next'
+    return simbala_sortego
+
+
+def complete_before_and_after_next(port: int) -> bytes:
+    with connect_interactive_client(port) as sock:
+        output = b''
+        # Complete before the name is defined, then again after next defines it in the same frame
+        sock.sendall(b'simbala_so\t')
+        output += read_until_quiet(sock, PROMPT_TIMEOUT)
+        for keys, marker in ((b'\x15n\r', PROMPT_START), (b'simbala_so\t', b'rtego'), (b'\r', b'after next')):
+            sock.sendall(keys)
+            output += read_until(sock, marker)
+        sock.sendall(b'c\r')
+        output += read_until_quiet(sock, PROMPT_TIMEOUT)
+    return output
+
+
+def test_completions_are_refreshed_after_next(port, start_debugger_with_ctty):
+    with run_script_in_process(define_after_set_trace_script, start_debugger_with_ctty, port):
+        output = run_in_process(complete_before_and_after_next, port).finish().get(0)
+    # The printed value ends its line, unlike the highlighted one in the source listing
+    assert b"'completed after next'\r\n" in output
@@ -0,0 +1,40 @@
+import os
+import time
+import madbg
+from madbg.consts import FORK_PORT_RANGE
+from madbg.discovery import list_debuggers
+
+from .utils import run_in_process, run_script_in_process, run_client, JOIN_TIMEOUT
+
+
+def fork_script(port) -> bool:
+    """
+    Fork after setting up the debugger, and have both processes wait for a client to break their loop.
+    """
+    madbg.set_trace_on_connect(port=port, follow_forks=True)
+    child_pid = os.fork()
+    conti = True
+    while conti:
+        time.sleep(0.1)
+    if child_pid == 0:
+        os._exit(0)
+    return os.waitpid(child_pid, 0)[1] == 0
+
+
+def find_child_port(port) -> int:
+    deadline = time.monotonic() + JOIN_TIMEOUT
+    while time.monotonic() < deadline:
+        parents = {entry['pid'] for entry in list_debuggers() if entry['port'] == port}
+        for entry in list_debuggers():
+            if entry['ppid'] in parents and port < entry['port'] < port + FORK_PORT_RANGE:
+                return entry['port']
+        time.sleep(0.1)
+    raise TimeoutError()
+
+
+def test_forked_child_is_debugged(port, start_debugger_with_ctty):
+    with run_script_in_process(fork_script, start_debugger_with_ctty, port) as script_result:
+        child_port = find_child_port(port)
+        run_in_process(run_client, child_port, b'conti = False\nc\n').finish()
+        run_in_process(run_client, port, b'conti = False\nc\n').finish()
+    assert script_result.get(0)
@@ -0,0 +1,23 @@
+import madbg
+
+from .utils import run_in_process, run_script_in_process, run_client
+
+
+def logpoint_script(port):
+    total = 0
+    madbg.set_trace(port=port)
+    for i in range(3):
+        total += i
+    return total
+
+
+LOGPOINT_LINE = logpoint_script.__code__.co_firstlineno + 4
+
+
+def test_logpoint(port, start_debugger_with_ctty):
+    with run_script_in_process(logpoint_script, start_debugger_with_ctty, port) as script_result:
+        debugger_input = f'logpoint {LOGPOINT_LINE} i, total\nc\n'.encode()
+        output = run_in_process(run_client, port, debugger_input).finish().get(0)
+    assert script_result.get(0) == 3
+    for i, total in ((0, 0), (1, 0), (2, 1)):
+        assert f'[logpoint 1] test_logpoints.py:{LOGPOINT_LINE} i, total = {i}, {total}'.encode() in output
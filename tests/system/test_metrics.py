@@ -0,0 +1,21 @@
+import madbg
+
+from .utils import run_in_process, run_script_in_process, run_client
+
+
+def stats_script(port):
+    madbg.set_trace(port=port)
+    return madbg.stats()
+
+
+def test_session_stats(port, start_debugger_with_ctty):
+    with run_script_in_process(stats_script, start_debugger_with_ctty, port) as script_result:
+        output = run_in_process(run_client, port, b'stats\nc\n').finish().get(0)
+    assert b'Stopped 1 time(s)' in output
+    assert b'Connect to prompt latency: ' in output
+    session = script_result.get(0)['session']
+    assert session['stops'] == 1
+    assert session['stopped_seconds'] > 0
+    assert 0 < session['connect_to_prompt_seconds'] < session['stopped_seconds']
+    assert session['input_bytes'] == len(b'stats\rc\r')
+    assert session['output_bytes'] > 0
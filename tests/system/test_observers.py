@@ -0,0 +1,36 @@
+import time
+import madbg
+from madbg.client import connect_to_server
+from madbg.consts import OBSERVER_HANDSHAKE_TIMEOUT
+
+from .utils import run_in_process, run_script_in_process, run_client, JOIN_TIMEOUT, CONNECT_TIMEOUT
+
+
+def set_trace_with_observers_script(port):
+    madbg.set_trace(port=port, options=madbg.SessionOptions(max_observers=1))
+
+
+def test_observer_sees_session_output(port, start_debugger_with_ctty):
+    with run_script_in_process(set_trace_with_observers_script, start_debugger_with_ctty, port):
+        with run_in_process(run_client, port, b'import time; time.sleep(2)\nprint("simbala")\nc\n'):
+            # Let the driving client connect first
+            time.sleep(1)
+            observer_output = run_in_process(run_client, port, b'', observe=True).finish().get(0)
+    assert b'simbala' in observer_output
+    assert b'Closing connection' in observer_output
+
+
+def test_silent_connection_doesnt_stall_session(port, start_debugger_with_ctty, tmp_path):
+    connected_path = tmp_path / 'connected'
+    debugger_input = f'open({str(connected_path)!r}, "w").close(); time.sleep(2)\nprint("simbala")\nc\n'.encode()
+    with run_script_in_process(set_trace_with_observers_script, start_debugger_with_ctty, port):
+        with run_in_process(run_client, port, b'import time\n' + debugger_input) as client_result:
+            while not connected_path.exists():
+                time.sleep(0.1)
+            # Never sends its terminal data
+            with connect_to_server('127.0.0.1', port, CONNECT_TIMEOUT):
+                start = time.monotonic()
+                client_output = client_result.get(JOIN_TIMEOUT)
+                elapsed = time.monotonic() - start
+    assert b'simbala' in client_output
+    assert elapsed < OBSERVER_HANDSHAKE_TIMEOUT - 1
@@ -0,0 +1,37 @@
+import madbg
+from madbg.prediction import EchoPredictor, NEUTRAL_SEQUENCE
+
+from .utils import run_in_process, run_script_in_process, connect_interactive_client, read_until_quiet, \
+    PROMPT_TIMEOUT
+
+ECHO_TIMEOUT = 0.3
+
+
+def set_trace_script(port):
+    madbg.set_trace(port=port)
+
+
+def predict_echo_of_debugger(port: int, keys: bytes):
+    """ Type keys one at a time, passing the debugger's echo through a predictor, and return the predictor's state """
+    predictor = EchoPredictor(min_rtt=0)
+    with connect_interactive_client(port) as sock:
+        shown = b''
+        for key in keys:
+            shown += predictor.on_input(bytes([key]))
+            sock.sendall(bytes([key]))
+            shown += predictor.on_output(read_until_quiet(sock, ECHO_TIMEOUT))
+        state = predictor.rtt, predictor.confident, bytes(predictor.pending)
+        # Clear the line and continue
+        sock.sendall(b'\x15c\r')
+        read_until_quiet(sock, PROMPT_TIMEOUT)
+    return state, shown
+
+
+def test_echo_of_real_debugger_is_predicted(port, start_debugger_with_ctty):
+    with run_script_in_process(set_trace_script, start_debugger_with_ctty, port):
+        (rtt, confident, pending), shown = run_in_process(predict_echo_of_debugger, port, b'print(1)').finish().get(0)
+    assert rtt is not None
+    assert confident
+    assert pending == b''
+    # Each key is shown once, either predicted or echoed
+    assert NEUTRAL_SEQUENCE.sub(b'', shown) == b'print(1)'
@@ -0,0 +1,17 @@
+import madbg
+from madbg.recording import SessionRecording, INPUT, OUTPUT
+
+from .utils import run_in_process, run_script_in_process, run_client
+
+
+def set_trace_with_recording_script(port, record_path):
+    madbg.set_trace(port=port, options=madbg.SessionOptions(record_path=record_path))
+
+
+def test_session_is_recorded(port, start_debugger_with_ctty, tmp_path):
+    record_path = str(tmp_path / 'session.rec')
+    with run_script_in_process(set_trace_with_recording_script, start_debugger_with_ctty, port, record_path):
+        run_in_process(run_client, port, b'c\n').finish()
+    records = list(SessionRecording(record_path).records())
+    assert b'c' in b''.join(data for _, direction, data in records if direction == INPUT)
+    assert b'Closing connection' in b''.join(data for _, direction, data in records if direction == OUTPUT)
@@ -1,3 +1,4 @@
+import json
 from pytest import raises
 from madbg import run_with_debugging
 
@@ -20,3 +21,19 @@ def test_run_with_debugging_with_set_trace(port, start_debugger_with_ctty):
     with run_script_in_process(run_divide_with_zero_with_debugging_script, start_debugger_with_ctty, port,
                                             set_trace=True, post_mortem=False):
         run_in_process(run_client, port, b'n\nn\nyo = 0\nc\n').finish()
+
+
+def run_restarted_script(port, output_path):
+    run_with_debugging(str(SCRIPTS_PATH / 'restarted.py'), argv=[output_path], port=port, use_post_mortem=False,
+                       use_set_trace=True)
+
+
+def test_restart_reloads_only_modules_of_the_script(port, start_debugger_with_ctty, tmp_path):
+    output_path = tmp_path / 'runs.json'
+    with run_script_in_process(run_restarted_script, start_debugger_with_ctty, port, str(output_path)):
+        # Restart twice after the output was written
+        output = run_in_process(run_client, port, b'b 11\nc\nrestart\nc\nrestart\nc\nc\n').finish().get(0)
+    assert output.count(b'Restarting') == 2
+    tokens = json.loads(output_path.read_text())
+    assert len(tokens) == 3
+    assert len(set(tokens)) == 3
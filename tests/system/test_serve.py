@@ -0,0 +1,35 @@
+import asyncio
+import madbg
+
+from .utils import run_in_process, run_script_in_process, run_client
+
+
+def serve_script(port) -> bool:
+    """
+    Run a loop serving debugger clients, until a client stops it.
+    """
+    loop = asyncio.new_event_loop()
+    server = loop.create_task(madbg.serve(port=port))
+    ticks = 0
+
+    def tick():
+        nonlocal ticks
+        ticks += 1
+        loop.call_later(0.01, tick)
+
+    tick()
+    loop.run_forever()
+    server.cancel()
+    loop.run_until_complete(asyncio.gather(server, return_exceptions=True))
+    loop.close()
+    return ticks > 0
+
+
+def test_serve(port, start_debugger_with_ctty):
+    with run_script_in_process(serve_script, start_debugger_with_ctty, port) as script_result:
+        # Test we can connect twice
+        run_in_process(run_client, port, b'q\n').finish()
+        output = run_in_process(run_client, port, b'asyncio.get_running_loop().stop()\nc\n').finish().get(0)
+    # Stopped in serve
+    assert b'api.py' in output
+    assert script_result.get(0)
@@ -0,0 +1,30 @@
+import sys
+
+import madbg
+
+from .utils import run_in_process, run_script_in_process, run_client
+
+DEPTH = 2000
+
+
+def recurse(port, depth):
+    if depth:
+        return recurse(port, depth - 1)
+    madbg.set_trace(port=port)
+
+
+def deep_recursion_script(port):
+    sys.setrecursionlimit(DEPTH + 1000)
+    recurse(port, DEPTH)
+
+
+def test_where_collapses_deep_recursion(port, start_debugger_with_ctty):
+    # A single line of context keeps the output within the client pty's buffer
+    with run_script_in_process(deep_recursion_script, start_debugger_with_ctty, port):
+        output = run_in_process(run_client, port, b'where 1\nup 1500\nwhere 1\nc\n').finish().get(0)
+    assert b'previous 1 frame(s) repeated 1999 more time(s)' in output
+    # After going up, the current frame splits the recursion
+    assert b'previous 1 frame(s) repeated 1498 more time(s)' in output
+    assert b'previous 1 frame(s) repeated 499 more time(s)' in output
+    # Only a few frames of the recursion are formatted
+    assert output.count(b'test_stack.py') < 20
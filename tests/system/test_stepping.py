@@ -0,0 +1,58 @@
+import pytest
+
+import madbg
+
+from .utils import run_in_process, run_script_in_process, run_client
+
+
+def heavy():
+    return sum(range(100000))
+
+
+def stepping_script(port):
+    madbg.set_trace(port=port)
+    value = heavy()
+    for i in range(3):
+        value += i
+    value += 1
+    return value
+
+
+FIRST_LINE = stepping_script.__code__.co_firstlineno
+
+
+def test_next_until_return(port, start_debugger_with_ctty):
+    debugger_input = f'n\nuntil {FIRST_LINE + 5}\nr\nc\n'.encode()
+    with run_script_in_process(stepping_script, start_debugger_with_ctty, port) as script_result:
+        output = run_in_process(run_client, port, debugger_input).finish().get(0)
+    assert script_result.get(0) == sum(range(100000)) + 4
+    positions = [output.find(f'---> {FIRST_LINE + offset}'.encode()) for offset in (2, 3, 5, 6)]
+    assert -1 not in positions
+    assert positions == sorted(positions)
+    assert b'--Return--' in output[positions[-2]:positions[-1]]
+
+
+def returning_callee(port):
+    madbg.set_trace(port=port)
+    return 1
+
+
+def calling_script(port):
+    value = returning_callee(port)
+    value += 1
+    return value
+
+
+CALLING_FIRST_LINE = calling_script.__code__.co_firstlineno
+
+
+@pytest.mark.parametrize('command', ['n', 'until'])
+def test_step_from_return(port, start_debugger_with_ctty, command):
+    debugger_input = f'n\n{command}\n{command}\nc\n'.encode()
+    with run_script_in_process(calling_script, start_debugger_with_ctty, port) as script_result:
+        output = run_in_process(run_client, port, debugger_input).finish().get(0)
+    assert script_result.get(0) == 2
+    positions = [output.find(f'---> {CALLING_FIRST_LINE + offset}'.encode()) for offset in (2, 3)]
+    assert -1 not in positions
+    assert positions == sorted(positions)
+    assert b'--Return--' in output[:positions[0]]
@@ -0,0 +1,33 @@
+import time
+import madbg
+from madbg.options import SessionOptions
+
+from .utils import run_in_process, run_script_in_process, run_client, run_disconnecting_client
+
+
+def set_trace_on_connect_script(port) -> bool:
+    madbg.set_trace_on_connect(port=port)
+    conti = True
+    while conti:
+        time.sleep(0.1)
+    return True
+
+
+def idle_script(port) -> bool:
+    madbg.set_trace(port=port, options=SessionOptions(idle_timeout=0.5))
+    return True
+
+
+def test_client_disconnect_detaches(port, start_debugger_with_ctty):
+    with run_script_in_process(set_trace_on_connect_script, start_debugger_with_ctty, port) as script_result:
+        assert b'ipdb>' in run_in_process(run_disconnecting_client, port).finish().get(0)
+        # The program was resumed and set_trace_on_connect was re-armed
+        run_in_process(run_client, port, b'conti = False\nc\n').finish()
+    assert script_result.get(0)
+
+
+def test_idle_timeout(port, start_debugger_with_ctty):
+    with run_script_in_process(idle_script, start_debugger_with_ctty, port) as script_result:
+        output = run_in_process(run_client, port, b'').finish().get(0)
+    assert b'Detaching: the client was idle for more than 0.5s' in output
+    assert script_result.get(0)
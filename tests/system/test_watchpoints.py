@@ -0,0 +1,53 @@
+import madbg
+
+from .utils import run_in_process, run_script_in_process, run_client
+
+
+class Counter:
+    def __init__(self):
+        self.count = 0
+
+    def increment(self):
+        self.count += 1
+
+
+def watch_script(port):
+    counter = Counter()
+    madbg.set_trace(port=port)
+    for _ in range(3):
+        counter.increment()
+    return counter.count
+
+
+def test_watchpoint(port, start_debugger_with_ctty):
+    with run_script_in_process(watch_script, start_debugger_with_ctty, port) as script_result:
+        output = run_in_process(run_client, port, b'watch counter.count\nc\nc\nunwatch\nc\n').finish().get(0)
+    assert script_result.get(0) == 3
+    assert b'Old value = 0\r\nNew value = 1' in output
+    assert b'Old value = 1\r\nNew value = 2' in output
+    assert b'New value = 3' not in output
+
+
+
+def watch_local_script(port):
+    value = 0
+    madbg.set_trace(port=port)
+    value += 1
+    value += 1
+    return value
+
+
+WATCH_LOCAL_FIRST_LINE = watch_local_script.__code__.co_firstlineno
+
+
+def test_watchpoint_stops_right_after_change(port, start_debugger_with_ctty):
+    with run_script_in_process(watch_local_script, start_debugger_with_ctty, port) as script_result:
+        output = run_in_process(run_client, port, b'watch value\nc\nc\nn\nc\n').finish().get(0)
+    assert script_result.get(0) == 2
+    first_change = output.index(b'New value = 1')
+    second_change = output.index(b'New value = 2')
+    assert f'---> {WATCH_LOCAL_FIRST_LINE + 4}'.encode() in output[first_change:second_change]
+    assert b'--Return--' not in output[first_change:second_change]
+    assert f'---> {WATCH_LOCAL_FIRST_LINE + 5}'.encode() in output[second_change:]
+    # Stepping from the last line stops when the script returns
+    assert b'--Return--' in output[second_change:]
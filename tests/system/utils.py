@@ -3,16 +3,19 @@ import pty
 import select
 import socket
 import multiprocessing as mp
-from contextlib import closing, _GeneratorContextManager
+from contextlib import closing, contextmanager, _GeneratorContextManager
 from functools import wraps
 from pathlib import Path
 
 from madbg import client
+from madbg.communication import send_message
 from madbg.consts import STDIN_FILENO, STDOUT_FILENO, STDERR_FILENO
-from madbg.tty_utils import PTY
+from madbg.tty_utils import PTY, get_term_attrs
 
 JOIN_TIMEOUT = 10
 CONNECT_TIMEOUT = 5
+PROMPT_TIMEOUT = 1
+CURSOR_POSITION_REQUEST = b'\x1b[6n'
 SCRIPTS_PATH = Path(__file__).parent / 'scripts'
 
 # forked subprocesses don't run exitfuncs
@@ -87,13 +90,70 @@ def enter_pty(attach_as_ctty, connect_stdio_to_pty=True):
     return master_fd, slave_fd
 
 
-def run_client(port: int, debugger_input: bytes):
+def run_client(port: int, debugger_input: bytes, observe=False, target=None):
     """ Run client process and return client's tty output """
     master_fd, slave_fd = enter_pty(True, connect_stdio_to_pty=False)
     os.write(master_fd, debugger_input)
-    client.connect_to_debugger(port=port, timeout=CONNECT_TIMEOUT, in_fd=slave_fd, out_fd=slave_fd)
+    client.connect_to_debugger(port=port, timeout=CONNECT_TIMEOUT, in_fd=slave_fd, out_fd=slave_fd, observe=observe,
+                               target=target)
     data = b''
     while select.select([master_fd], [], [], 0)[0]:
         data += os.read(master_fd, 4096)
     PTY(master_fd, slave_fd).close()
     return data
+
+
+def run_disconnecting_client(port: int) -> bytes:
+    """ Run client process that disconnects once the debugger prompt is shown, and return the debugger's output """
+    master_fd, slave_fd = enter_pty(True, connect_stdio_to_pty=False)
+    data = b''
+    with client.connect_to_server('127.0.0.1', port, CONNECT_TIMEOUT) as sock:
+        send_message(sock, dict(term_attrs=get_term_attrs(slave_fd), term_type='xterm', term_size=(24, 80)))
+        while b'ipdb>' not in data:
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+    PTY(master_fd, slave_fd).close()
+    return data
+
+
+def read_until_quiet(sock: socket.socket, timeout: float) -> bytes:
+    """ Read from sock until nothing arrives for timeout seconds or it is closed """
+    data = b''
+    sock.settimeout(timeout)
+    try:
+        while chunk := sock.recv(4096):
+            data += chunk
+    except socket.timeout:
+        pass
+    return data
+
+
+def read_until(sock: socket.socket, marker: bytes, timeout: float = CONNECT_TIMEOUT) -> bytes:
+    """ Read from sock until marker arrives, or nothing arrives for timeout seconds or it is closed """
+    data = b''
+    sock.settimeout(timeout)
+    try:
+        while marker not in data and (chunk := sock.recv(4096)):
+            data += chunk
+    except socket.timeout:
+        pass
+    return data
+
+
+@contextmanager
+def connect_interactive_client(port: int):
+    """
+    Connect to the debugger like a terminal, and yield the socket once the prompt is shown,
+    to type keys one at a time and see how the debugger responds to each of them.
+    """
+    master_fd, slave_fd = enter_pty(True, connect_stdio_to_pty=False)
+    with client.connect_to_server('127.0.0.1', port, CONNECT_TIMEOUT) as sock:
+        send_message(sock, dict(term_attrs=get_term_attrs(slave_fd), term_type='xterm', term_size=(24, 80)))
+        if CURSOR_POSITION_REQUEST in read_until(sock, b'ipdb>'):
+            # Answer like a terminal, or prompt_toolkit redraws the prompt while keys are typed
+            sock.sendall(b'\x1b[1;1R')
+            read_until_quiet(sock, PROMPT_TIMEOUT)
+        yield sock
+    PTY(master_fd, slave_fd).close()
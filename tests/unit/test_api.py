@@ -0,0 +1,18 @@
+import socket
+
+from madbg import api, utils
+
+
+def test_get_free_server_socket_registers_only_the_bound_socket(monkeypatch):
+    registered = []
+    monkeypatch.setattr(utils, 'register_atexit', registered.append)
+    with socket.socket() as taken:
+        taken.bind(('127.0.0.1', 0))
+        taken_port = taken.getsockname()[1]
+        taken.listen()
+        server_socket, exit_stack, port = api._get_free_server_socket('127.0.0.1', taken_port)
+    with exit_stack:
+        assert port > taken_port
+        assert server_socket.getsockname()[1] == port
+        assert registered == [exit_stack.close]
+    assert server_socket.fileno() == -1
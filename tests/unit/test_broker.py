@@ -0,0 +1,59 @@
+import asyncio
+
+from pytest import raises
+
+from madbg import broker
+from madbg.broker import Broker, TargetError
+
+
+class Writer:
+    def __init__(self):
+        self.written = b''
+
+    def write(self, data: bytes):
+        self.written += data
+
+
+def read_line(data: bytes):
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        writer = Writer()
+        line = await Broker._read_line(reader, writer)
+        return line, writer.written, await reader.read()
+
+    return asyncio.run(read())
+
+
+def test_read_line_echoes_and_edits():
+    line, echo, rest = read_line(b'12\x7f3\x1b\rc\r')
+    assert line == '13'
+    assert echo == b'12\b \b3\r\n'
+    # What comes after the line is left for the target
+    assert rest == b'c\r'
+
+
+def test_read_line_abort():
+    with raises(TargetError):
+        read_line(b'1\x03')
+
+
+def connect_to_target(monkeypatch, debuggers, allow_attach=False):
+    monkeypatch.setattr(broker, 'list_debuggers', lambda: debuggers)
+    return asyncio.run(Broker('127.0.0.1', 0, connect_timeout=0.1, allow_attach=allow_attach)._connect_to_target(1234))
+
+
+def test_unregistered_process_is_not_attached_to(monkeypatch):
+    monkeypatch.setattr(broker, '_inject_set_trace', lambda *args: 1 / 0)
+    with raises(TargetError, match='not waiting'):
+        connect_to_target(monkeypatch, [])
+
+
+def test_connection_errors_are_reported(monkeypatch):
+    async def unreachable(ip, port):
+        raise OSError('Network is unreachable')
+
+    monkeypatch.setattr(asyncio, 'open_connection', unreachable)
+    with raises(TargetError, match='unreachable'):
+        connect_to_target(monkeypatch, [dict(pid=1234, ip='10.0.0.1', port=3513)])
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import pickle
+import struct
+import time
+
+from pytest import raises
+
+from madbg.communication import MESSAGE_LENGTH_FMT, READ_SIZE, Piping, set_nonblocking, pack_message, read_message, \
+    unpack_message
+from madbg.utils import run_thread
+
+
+def read_all(fd):
+    data = b''
+    while True:
+        chunk = os.read(fd, 4096)
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_piping_fans_out_to_all_destinations():
+    src_r, src_w = os.pipe()
+    dest1_r, dest1_w = os.pipe()
+    dest2_r, dest2_w = os.pipe()
+    os.write(src_w, b'simbala')
+    os.close(src_w)
+    Piping({src_r: {dest1_w, dest2_w}}).run()
+    for fd in (src_r, dest1_w, dest2_w):
+        os.close(fd)
+    assert read_all(dest1_r) == b'simbala'
+    assert read_all(dest2_r) == b'simbala'
+
+
+def test_piping_drops_slow_destination():
+    src_r, src_w = os.pipe()
+    fast_r, fast_w = os.pipe()
+    slow_r, slow_w = os.pipe()
+    set_nonblocking(slow_w)
+    dropped = []
+    piping = Piping({src_r: {fast_w}})
+    piping.add_pipe(src_r, slow_w, buffer_limit=10, drop_callback=dropped.append)
+    # Fill the slow pipe so nothing more can be written to it
+    while True:
+        try:
+            os.write(slow_w, b'x' * 4096)
+        except BlockingIOError:
+            break
+    os.write(src_w, b'sortego' * 10)
+    os.close(src_w)
+    piping.run()
+    os.close(fast_w)
+    assert dropped == [slow_w]
+    assert read_all(fast_r) == b'sortego' * 10
+
+
+def test_piping_holds_back_sources_of_slow_destination():
+    src_r, src_w = os.pipe()
+    dest_r, dest_w = os.pipe()
+    set_nonblocking(dest_w)
+    data = b'sortego' * 100000
+    piping = Piping({})
+    piping.add_pipe(src_r, dest_w, pause_limit=10)
+
+    def write_source():
+        os.write(src_w, data)
+        os.close(src_w)
+
+    received = b''
+    with run_thread(piping.run), run_thread(write_source):
+        time.sleep(0.2)
+        # The destination isn't read, so only what the pipe holds and a single read are pending
+        assert len(piping.buffers[dest_w]) <= 10 + READ_SIZE
+        while len(received) < len(data):
+            received += os.read(dest_r, 65536)
+    assert received == data
+    for fd in (src_r, dest_r, dest_w):
+        os.close(fd)
+
+
+def test_piping_drains_until_closed():
+    src_r, src_w = os.pipe()
+    piping = Piping({})
+    piping.drain(src_r)
+    with run_thread(piping.run):
+        # More than the pipe can hold, so this blocks unless it is drained
+        os.write(src_w, b'sortego' * 100000)
+        os.close(src_w)
+    os.close(src_r)
+
+
+def test_read_message():
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(pack_message(dict(term_type='xterm')) + b'rest')
+        return await read_message(reader), await reader.read(4)
+
+    assert asyncio.run(read()) == (dict(term_type='xterm'), b'rest')
+
+
+def test_unpack_message():
+    packed = pack_message(dict(term_type='xterm'))
+    buffer = bytearray(packed[:-1])
+    assert unpack_message(buffer) is None
+    buffer += packed[-1:] + b'rest'
+    assert unpack_message(buffer) == dict(term_type='xterm')
+    assert buffer == b'rest'
+
+
+def test_messages_are_not_unpickled():
+    pickled = pickle.dumps(dict(term_type='xterm'))
+    buffer = bytearray(struct.pack(MESSAGE_LENGTH_FMT, len(pickled)) + pickled)
+    with raises(ValueError):
+        unpack_message(buffer)
@@ -0,0 +1,80 @@
+import time
+
+from prompt_toolkit.completion import Completer, Completion, CompleteEvent
+from prompt_toolkit.document import Document
+
+from madbg.completion import BudgetedCompleter, NamespaceCompleter
+
+
+class SlowCompleter(Completer):
+    def __init__(self):
+        self.calls = 0
+
+    def get_completions(self, document, complete_event):
+        self.calls += 1
+        yield Completion('simbala')
+        time.sleep(0.5)
+        yield Completion('sortego')
+
+
+def complete(completer, text='s'):
+    return [c.text for c in completer.get_completions(Document(text), CompleteEvent(completion_requested=True))]
+
+
+def test_partial_completions_when_budget_runs_out():
+    completer = BudgetedCompleter(SlowCompleter(), lambda: None, budget=0.1)
+    start = time.perf_counter()
+    assert complete(completer) == ['simbala']
+    assert time.perf_counter() - start < 0.4
+    assert completer.stats.partial == 1
+
+
+def test_completions_are_cached_per_frame():
+    slow_completer = SlowCompleter()
+    frame = object()
+    completer = BudgetedCompleter(slow_completer, lambda: frame, budget=1)
+    assert complete(completer) == ['simbala', 'sortego']
+    assert complete(completer) == ['simbala', 'sortego']
+    assert slow_completer.calls == 1
+    frame = object()
+    complete(completer)
+    assert slow_completer.calls == 2
+
+
+class BlockingCompleter(Completer):
+    """ Like IPython's completer, which yields nothing until it has finished """
+
+    def __init__(self):
+        self.running = False
+
+    def get_completions(self, document, complete_event):
+        self.running = True
+        try:
+            while True:
+                time.sleep(0.01)
+        finally:
+            self.running = False
+        yield Completion('simbala_sortego')
+
+
+def test_namespace_fallback_when_budget_runs_out():
+    namespace = dict(simbala_sortego=1, simbala_other=2, unrelated=3)
+    completer = BudgetedCompleter(BlockingCompleter(), lambda: None, budget=0.1,
+                                  fallback=NamespaceCompleter(lambda: [namespace]))
+    try:
+        assert complete(completer, 'print(simbala_') == ['simbala_other', 'simbala_sortego']
+        assert complete(completer, 'x.simbala_') == []
+    finally:
+        completer.close()
+
+
+def test_invalidate_stops_running_completions():
+    blocking_completer = BlockingCompleter()
+    completer = BudgetedCompleter(blocking_completer, lambda: None, budget=0.1)
+    complete(completer)
+    assert blocking_completer.running
+    thread = next(iter(completer.cache.values())).thread
+    completer.invalidate()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert not blocking_completer.running
@@ -0,0 +1,50 @@
+import json
+import os
+
+from pytest import raises
+
+from madbg.discovery import register_debugger, unregister_debugger, list_debuggers, get_registry_dir
+
+
+def test_register_and_list():
+    register_debugger('127.0.0.1', 1337)
+    try:
+        entries = [entry for entry in list_debuggers() if entry['pid'] == os.getpid()]
+        assert [(entry['ip'], entry['port'], entry['ppid']) for entry in entries] == [('127.0.0.1', 1337, os.getppid())]
+    finally:
+        unregister_debugger()
+    assert os.getpid() not in [entry['pid'] for entry in list_debuggers()]
+
+
+def test_stale_entries_are_removed():
+    # Our pid with a different start time, like a process that exited and had its pid reused
+    stale_path = os.path.join(get_registry_dir(), f'{os.getpid()}.json')
+    os.makedirs(get_registry_dir(), mode=0o700, exist_ok=True)
+    with open(stale_path, 'w') as stale_file:
+        json.dump(dict(pid=os.getpid(), ppid=1, ip='127.0.0.1', port=1337, argv=[], start_time=-1), stale_file)
+    assert os.getpid() not in [entry['pid'] for entry in list_debuggers()]
+    assert not os.path.exists(stale_path)
+
+
+def test_runtime_dir_is_preferred(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    assert get_registry_dir() == str(tmp_path / 'madbg')
+
+
+def test_registry_not_private_to_user_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    # Like a directory created by another user, who can write to it
+    os.mkdir(get_registry_dir(), mode=0o777)
+    os.chmod(get_registry_dir(), 0o777)
+    with raises(PermissionError):
+        register_debugger('127.0.0.1', 1337)
+    with raises(PermissionError):
+        list_debuggers()
+
+
+def test_registry_symlink_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmp_path))
+    (tmp_path / 'planted').mkdir(mode=0o700)
+    os.symlink(tmp_path / 'planted', get_registry_dir())
+    with raises(PermissionError):
+        list_debuggers()
@@ -0,0 +1,114 @@
+import os
+import select
+import sys
+
+from pytest import fixture, mark
+
+from madbg.logpoints import Logpoints, LogpointMonitor, LogOutput
+from madbg.watchpoints import MONITORING_AVAILABLE
+
+
+def loop(count):
+    total = 0
+    for i in range(count):
+        total += i  # logged line
+    return total
+
+
+LOGGED_LINE = loop.__code__.co_firstlineno + 3
+
+
+def unrelated():
+    return sum(range(10))
+
+
+@fixture
+def output():
+    read_fd, write_fd = os.pipe()
+    log_output = LogOutput(write_fd)
+    yield log_output, read_fd
+    log_output.close()
+    os.close(read_fd)
+    os.close(write_fd)
+
+
+def test_only_code_with_logpoints_is_traced(output):
+    logpoints = Logpoints(output[0], os.path.abspath)
+    logpoints.add(os.path.abspath(__file__), LOGGED_LINE, 'i')
+    assert list(logpoints.in_code(loop.__code__)) == [LOGGED_LINE]
+    assert logpoints.in_code(unrelated.__code__) is None
+
+
+def test_hits_are_logged_and_rate_limited(output):
+    log_output, read_fd = output
+    logpoints = Logpoints(log_output, os.path.abspath)
+    logpoint = logpoints.add(os.path.abspath(__file__), LOGGED_LINE, 'i, total', rate=3)
+    sys.settrace(logpoints.call_filter())
+    try:
+        loop(10)
+    finally:
+        sys.settrace(None)
+    log_output.flush()
+    logged = os.read(read_fd, 4096).decode()
+    assert logged.splitlines() == [f'[logpoint 1] test_logpoints.py:{LOGGED_LINE} i, total = {i}, {total}'
+                                   for i, total in ((0, 0), (1, 0), (2, 1))]
+    assert (logpoint.hits, logpoint.dropped) == (10, 7)
+
+
+def test_evaluation_errors_are_logged(output):
+    log_output, read_fd = output
+    logpoints = Logpoints(log_output, os.path.abspath)
+    logpoints.add(os.path.abspath(__file__), LOGGED_LINE, 'missing', rate=1)
+    sys.settrace(logpoints.call_filter())
+    try:
+        loop(1)
+    finally:
+        sys.settrace(None)
+    log_output.flush()
+    assert b"<NameError: name 'missing' is not defined>" in os.read(read_fd, 4096)
+
+
+@mark.skipif(not MONITORING_AVAILABLE, reason='sys.monitoring is not available')
+def test_monitor_logs_hits(output):
+    log_output, read_fd = output
+    logpoints = Logpoints(log_output, os.path.abspath)
+    logpoint = logpoints.add(os.path.abspath(__file__), LOGGED_LINE, 'i')
+    monitor = LogpointMonitor(logpoints)
+    assert monitor.start(sys._getframe())
+    try:
+        unrelated()
+        loop(5)
+    finally:
+        monitor.stop()
+    loop(5)
+    assert logpoint.hits == 5
+    log_output.flush()
+    assert os.read(read_fd, 4096).decode().count('[logpoint 1]') == 5
+
+
+def test_output_is_dropped_instead_of_blocking(output):
+    log_output, read_fd = output
+    # Fill the pipe so nothing more can be written to it
+    while True:
+        try:
+            os.write(log_output.fd, b'x' * 4096)
+        except BlockingIOError:
+            break
+    for i in range(3):
+        log_output.add(f'line {i}')
+    log_output.flush()
+    # The line that didn't fit is written next time, and the lines after it are dropped
+    assert log_output.overflowed == 2
+    while select.select([read_fd], [], [], 0)[0]:
+        os.read(read_fd, 65536)
+    log_output.flush()
+    assert os.read(read_fd, 4096) == b'line 0\n[logpoints] 2 line(s) dropped, the output could not keep up\n'
+
+
+def test_output_can_be_closed_twice():
+    read_fd, write_fd = os.pipe()
+    log_output = LogOutput(write_fd)
+    log_output.close()
+    log_output.close()
+    os.close(read_fd)
+    os.close(write_fd)
@@ -0,0 +1,58 @@
+import json
+import time
+
+from pytest import raises
+
+from madbg.metrics import SessionStats, RELAYED_INPUT, RELAYED_OUTPUT, session_started, session_ended, stats, \
+    dump_stats
+
+
+def test_session_stats():
+    session_stats = SessionStats()
+    input_tap = session_stats.relay_tap(RELAYED_INPUT)
+    input_tap(b'n\r')
+    input_tap(b'c\r')
+    session_stats.relay_tap(RELAYED_OUTPUT)(b'ipdb> ')
+    session_stats.prompt_shown()
+    for duration in (0.01, 0.05):
+        session_stats.stop_started()
+        time.sleep(duration)
+        session_stats.stop_ended()
+    counters = session_stats.counters()
+    assert (counters['input_bytes'], counters['input_chunks']) == (4, 2)
+    assert (counters['output_bytes'], counters['output_chunks']) == (6, 1)
+    assert counters['stops'] == 2
+    assert 0.06 <= counters['stopped_seconds'] < 0.5
+    assert 0.05 <= session_stats.max_stop() < counters['stopped_seconds']
+    assert session_stats.prompt_latency < counters['stopped_seconds']
+
+
+def test_totals_include_the_active_session():
+    before = stats()
+    ended_stats, active_stats = SessionStats(), SessionStats()
+    session_started(ended_stats)
+    ended_stats.relay_tap(RELAYED_INPUT)(b'abc')
+    session_ended(ended_stats)
+    session_started(active_stats)
+    try:
+        active_stats.relay_tap(RELAYED_INPUT)(b'de')
+        active_stats.stop_started()
+        current = stats()
+    finally:
+        session_ended(active_stats)
+    assert current['active']
+    assert current['sessions'] == before['sessions'] + 2
+    assert current['totals']['input_bytes'] == before['totals']['input_bytes'] + 5
+    assert current['totals']['stops'] == before['totals']['stops'] + 1
+    assert current['session']['input_bytes'] == 2
+    assert not stats()['active']
+
+
+def test_dumps(tmp_path):
+    path = tmp_path / 'stats.json'
+    assert json.loads(dump_stats(str(path))) == json.loads(path.read_text())
+    prometheus_lines = dump_stats(output_format='prometheus').splitlines()
+    assert '# TYPE madbg_stopped_seconds_total counter' in prometheus_lines
+    assert any(line.startswith('madbg_output_bytes_total ') for line in prometheus_lines)
+    with raises(ValueError):
+        dump_stats(output_format='xml')
@@ -0,0 +1,51 @@
+from madbg.prediction import EchoPredictor, erase
+
+
+def test_confirmed_prediction_is_not_written_twice():
+    predictor = EchoPredictor(min_rtt=0)
+    predictor.rtt = 0.2
+    assert predictor.on_input(b'ab') == b'ab'
+    assert predictor.on_output(b'a') == b''
+    assert predictor.on_output(b'b\r\n') == b'\r\n'
+    assert not predictor.pending
+
+
+def test_echo_wrapped_in_escape_sequences():
+    # As prompt_toolkit echoes a key
+    echo = b'\x1b[?25l\x1b[?7l\x1b[0m%s\x1b[?7h\x1b[0m\x1b[?12l\x1b[?25h'
+    predictor = EchoPredictor(min_rtt=0)
+    assert predictor.on_input(b'a') == b''
+    assert predictor.on_output(echo % b'a') == echo % b'a'
+    assert predictor.rtt is not None
+    assert predictor.on_input(b'bc') == b'bc'
+    assert predictor.on_output(echo % b'b') == echo % b''
+    assert predictor.on_output(echo % b'c') == echo % b''
+    assert predictor.confident
+    assert not predictor.pending
+
+
+def test_wrong_prediction_is_erased():
+    predictor = EchoPredictor(min_rtt=0)
+    predictor.rtt = 0.2
+    assert predictor.on_input(b'abc') == b'abc'
+    assert predictor.on_output(b'a\x1b[2Db') == erase(2) + b'\x1b[2Db'
+    assert not predictor.confident
+    # Predictions are hidden until one is right
+    assert predictor.on_input(b'd') == b''
+    assert predictor.on_output(b'd') == b'd'
+    assert predictor.on_input(b'e') == b'e'
+
+
+def test_no_prediction_after_control_keys():
+    predictor = EchoPredictor(min_rtt=0)
+    predictor.rtt = 0.2
+    assert predictor.on_input(b'\rab') == b''
+    assert predictor.on_output(b'\r\nipdb> ') == b'\r\nipdb> '
+    assert predictor.on_input(b'c') == b'c'
+
+
+def test_no_prediction_on_fast_connections():
+    predictor = EchoPredictor(min_rtt=1)
+    assert predictor.on_input(b'a') == b''
+    assert predictor.on_output(b'a') == b'a'
+    assert predictor.on_input(b'b') == b''
@@ -0,0 +1,66 @@
+import os
+
+from pytest import raises
+
+from madbg.recording import SessionRecorder, SessionRecording, INPUT, OUTPUT
+
+
+def test_record_and_replay(tmp_path):
+    path = str(tmp_path / 'session.rec')
+    recorder = SessionRecorder(path)
+    recorder.tap(INPUT)(b'n\r')
+    recorder.tap(OUTPUT)(b'simbala')
+    recorder.tap(OUTPUT)(b'sortego')
+    recorder.close()
+    recording = SessionRecording(path)
+    assert [(direction, data) for _, direction, data in recording.records()] == \
+           [(INPUT, b'n\r'), (OUTPUT, b'simbala'), (OUTPUT, b'sortego')]
+    read_fd, write_fd = os.pipe()
+    recording.replay(write_fd, speed=1000)
+    os.close(write_fd)
+    assert os.read(read_fd, 100) == b'simbalasortego'
+
+
+def test_replay_with_clock_set_back(tmp_path):
+    path = str(tmp_path / 'session.rec')
+    recorder = SessionRecorder(path)
+    for timestamp, data in ((1000., b'simbala'), (990., b'sortego')):
+        recorder.pending.append((timestamp, OUTPUT, data))
+    recorder.close()
+    read_fd, write_fd = os.pipe()
+    SessionRecording(path).replay(write_fd)
+    os.close(write_fd)
+    assert os.read(read_fd, 100) == b'simbalasortego'
+
+
+def test_seek_with_index(tmp_path):
+    path = str(tmp_path / 'session.rec')
+    recorder = SessionRecorder(path)
+    for i in range(5):
+        recorder.pending.append((1000. + i * 10, OUTPUT, str(i).encode()))
+    recorder.close()
+    recording = SessionRecording(path)
+    assert len(recording.index) == 5
+    assert [data for _, _, data in recording.records(1025.)] == [b'3', b'4']
+
+
+def test_sessions_are_appended(tmp_path):
+    path = str(tmp_path / 'session.rec')
+    for data in (b'simbala', b'sortego'):
+        recorder = SessionRecorder(path)
+        recorder.tap(OUTPUT)(data)
+        recorder.close()
+    records = list(SessionRecording(path).records())
+    assert [data for _, _, data in records] == [b'simbala', b'sortego']
+    # The second session is timestamped from where the first one ended
+    first_timestamp, second_timestamp = [timestamp for timestamp, _, _ in records]
+    assert 0 <= first_timestamp <= second_timestamp < 1
+
+
+def test_replay_speed_must_be_positive(tmp_path):
+    path = str(tmp_path / 'session.rec')
+    recorder = SessionRecorder(path)
+    recorder.tap(OUTPUT)(b'simbala')
+    recorder.close()
+    with raises(ValueError, match='positive'):
+        SessionRecording(path).replay(1, speed=0)
@@ -0,0 +1,51 @@
+import json
+import site
+import sys
+from pathlib import Path
+
+from madbg.restart import unload_modules, get_script_dir
+
+
+def test_unload_modules_under_dirs(tmp_path, monkeypatch):
+    (tmp_path / 'user_module.py').write_text('')
+    (tmp_path / 'user_package').mkdir()
+    (tmp_path / 'user_package' / '__init__.py').write_text('')
+    (tmp_path / 'user_package' / 'sub.py').write_text('')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import user_module
+    import user_package.sub
+    assert sorted(unload_modules(dirs=[str(tmp_path)])) == ['user_module', 'user_package', 'user_package.sub']
+    assert 'user_module' not in sys.modules
+    assert sys.modules['json'] is json
+
+
+def test_user_site_modules_are_kept(tmp_path, monkeypatch):
+    user_site = tmp_path / 'user_site'
+    user_site.mkdir()
+    (user_site / 'user_site_module.py').write_text('')
+    (tmp_path / 'script_module.py').write_text('')
+    monkeypatch.setattr(site, 'getusersitepackages', lambda: str(user_site))
+    monkeypatch.syspath_prepend(str(user_site))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import user_site_module
+    import script_module
+    assert unload_modules(dirs=[str(tmp_path)]) == ['script_module']
+    assert sys.modules['user_site_module'] is user_site_module
+    del sys.modules['user_site_module']
+
+
+def test_unload_modules_by_name(tmp_path, monkeypatch):
+    (tmp_path / 'named_package').mkdir()
+    (tmp_path / 'named_package' / '__init__.py').write_text('')
+    (tmp_path / 'named_package' / 'sub.py').write_text('')
+    (tmp_path / 'named_package_not.py').write_text('')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import named_package.sub
+    import named_package_not
+    assert sorted(unload_modules(names=['named_package'])) == ['named_package', 'named_package.sub']
+    assert 'named_package_not' in sys.modules
+
+
+def test_get_script_dir(tmp_path):
+    assert get_script_dir(str(tmp_path / 'script.py'), run_as_module=False) == str(tmp_path)
+    assert get_script_dir('json.decoder', run_as_module=True) == str(Path(json.__file__).parent.parent)
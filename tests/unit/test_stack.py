@@ -0,0 +1,39 @@
+from madbg.stack import Repeat, collapse_repeats, summarize_stack
+
+
+def test_collapse_repeats():
+    assert collapse_repeats('abc') == [0, 1, 2]
+    assert collapse_repeats('mffffx') == [0, 1, Repeat(2, 5, 1), 5]
+    # A mutual recursion, with a partial repetition left at its end
+    assert collapse_repeats('mABABABA') == [0, 1, 2, Repeat(3, 7, 2), 7]
+    assert Repeat(3, 7, 2).times == 2
+
+
+def test_collapse_repeats_min_repeats():
+    assert collapse_repeats('mffx', min_repeats=3) == [0, 1, 2, 3]
+    assert collapse_repeats('mfffx', min_repeats=3) == [0, 1, Repeat(2, 4, 1), 4]
+
+
+def test_summarize_stack_keeps_current_frame():
+    keys = ['main'] + ['f'] * 1000
+    rows = summarize_stack(keys, [False] * len(keys), current=500)
+    assert rows == [0, 1, '    [... previous 1 frame(s) repeated 498 more time(s)]',
+                    500, 501, '    [... previous 1 frame(s) repeated 499 more time(s)]']
+
+
+def test_summarize_stack_skips_hidden_frames():
+    rows = summarize_stack('abcde', [True, False, True, True, False], current=3)
+    assert rows == ['    [... skipping 1 hidden frame(s)]', 1, '    [... skipping 1 hidden frame(s)]', 3,
+                    4]
+
+
+def test_summarize_stack_pages_around_current_frame():
+    keys = range(100)
+    hidden = [False] * 100
+    assert summarize_stack(keys, hidden, current=50, page_size=5) == [
+        "    [... 48 older frame(s), 'where all' shows them]", 48, 49, 50, 51, 52,
+        "    [... 47 newer frame(s), 'where all' shows them]"]
+    # Frames the newest frame leaves on the page go to older ones
+    assert summarize_stack(keys, hidden, current=99, page_size=5) == [
+        "    [... 95 older frame(s), 'where all' shows them]", 95, 96, 97, 98, 99]
+    assert summarize_stack(keys, hidden, current=50) == list(range(100))
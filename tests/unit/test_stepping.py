@@ -0,0 +1,104 @@
+import sys
+
+from pytest import mark
+
+from madbg.stepping import StepMonitor, line_skipping_tracer, step_calls_filter
+from madbg.watchpoints import MONITORING_AVAILABLE
+
+
+class RecordingDebugger:
+    """ Records the events passed to trace_dispatch, and stops tracing the frames they happened in """
+
+    def __init__(self, stopframe=None, stoplineno=0):
+        self.stopframe = stopframe
+        self.stoplineno = stoplineno
+        self.events = []
+
+    def trace_dispatch(self, frame, event, arg):
+        self.events.append((frame.f_code.co_name, event, frame.f_lineno))
+        return None
+
+
+def callee():
+    return sum(range(10))
+
+
+def loop_then_call():
+    total = 0
+    for i in range(3):
+        total += i
+    callee()
+    return total
+
+
+AFTER_LOOP = loop_then_call.__code__.co_firstlineno + 4
+
+
+def test_calls_filter_skips_calls_only_while_stepping_over():
+    debugger = RecordingDebugger(stopframe=sys._getframe())
+    sys.settrace(step_calls_filter(debugger))
+    try:
+        callee()
+        debugger.stopframe = None
+        callee()
+    finally:
+        sys.settrace(None)
+    assert debugger.events == [('callee', 'call', callee.__code__.co_firstlineno)]
+
+
+def test_line_skipping_tracer_passes_lines_from_target():
+    debugger = RecordingDebugger(stoplineno=AFTER_LOOP)
+
+    def trace_calls(frame, event, arg):
+        if frame.f_code is loop_then_call.__code__:
+            debugger.stopframe = frame
+            return line_skipping_tracer(debugger, AFTER_LOOP)
+        return None
+
+    sys.settrace(trace_calls)
+    try:
+        loop_then_call()
+    finally:
+        sys.settrace(None)
+    # Once the target line is reached, the debugger gets all events
+    assert debugger.events[0] == ('loop_then_call', 'line', AFTER_LOOP)
+
+
+@mark.skipif(not MONITORING_AVAILABLE, reason='sys.monitoring is not available')
+def test_monitor_stops_at_target_line():
+    reached = []
+    monitor = StepMonitor(lambda frame, event, arg: reached.append((frame.f_code.co_name, event, frame.f_lineno)))
+
+    def trace_calls(frame, event, arg):
+        if frame.f_code is loop_then_call.__code__:
+            sys.settrace(None)
+            assert monitor.start(frame, AFTER_LOOP)
+        return None
+
+    sys.settrace(trace_calls)
+    try:
+        loop_then_call()
+    finally:
+        sys.settrace(None)
+        monitor.stop()
+    assert reached == [('loop_then_call', 'line', AFTER_LOOP)]
+
+
+@mark.skipif(not MONITORING_AVAILABLE, reason='sys.monitoring is not available')
+def test_monitor_stops_on_return():
+    reached = []
+    monitor = StepMonitor(lambda frame, event, arg: reached.append((frame.f_code.co_name, event, arg)))
+
+    def trace_calls(frame, event, arg):
+        if frame.f_code is loop_then_call.__code__:
+            sys.settrace(None)
+            assert monitor.start(frame, None)
+        return None
+
+    sys.settrace(trace_calls)
+    try:
+        loop_then_call()
+    finally:
+        sys.settrace(None)
+        monitor.stop()
+    assert reached == [('loop_then_call', 'return', 3)]
@@ -0,0 +1,69 @@
+import os
+import socket
+import time
+
+from madbg.communication import Piping
+from madbg.metrics import SessionStats
+from madbg.options import SessionOptions
+from madbg.utils import run_thread
+from madbg.watchdog import SessionWatchdog
+
+
+def make_watchdog(options: SessionOptions, trips: list):
+    client, server = socket.socketpair()
+    output_r, output_w = os.pipe()
+    piping = Piping({server.fileno(): set(), output_r: {server.fileno()}})
+    stats = SessionStats()
+    watchdog = SessionWatchdog(piping, server.fileno(), output_r, stats, options, trips.append)
+    return watchdog, piping, stats, client, server, output_w
+
+
+def test_limits_only_trip_while_stopped():
+    trips = []
+    watchdog, piping, stats, client, server, output_w = make_watchdog(SessionOptions(idle_timeout=0.05), trips)
+    try:
+        time.sleep(0.1)
+        assert watchdog.check() is None
+        stats.stop_started()
+        assert watchdog.check() is None
+        time.sleep(0.1)
+        assert 'idle' in watchdog.check()
+    finally:
+        watchdog.close()
+        for sock in (client, server):
+            sock.close()
+
+
+def test_max_stop_time_trips_for_an_active_client():
+    trips = []
+    watchdog, piping, stats, client, server, output_w = make_watchdog(SessionOptions(max_stop_time=0.05), trips)
+    try:
+        stats.stop_started()
+        with run_thread(piping.run):
+            client.sendall(b'n\r')
+            time.sleep(0.1)
+            assert 'stopped' in watchdog.check()
+            os.close(output_w)
+    finally:
+        watchdog.close()
+        for sock in (client, server):
+            sock.close()
+
+
+def test_client_disconnect_trips_and_drains_output():
+    trips = []
+    watchdog, piping, stats, client, server, output_w = make_watchdog(SessionOptions(), trips)
+    try:
+        with run_thread(piping.run):
+            client.close()
+            deadline = time.monotonic() + 5
+            while len(trips) < 2 and time.monotonic() < deadline:
+                time.sleep(0.1)
+            # Nothing reads the output but the piping, so this would block if it wasn't drained
+            os.write(output_w, b'x' * (1 << 20))
+            os.close(output_w)
+    finally:
+        watchdog.close()
+        server.close()
+    # Tripping is repeated until the watchdog is closed
+    assert trips[:2] == ['the client disconnected'] * 2
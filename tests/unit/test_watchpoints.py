@@ -0,0 +1,60 @@
+import sys
+
+from pytest import mark
+
+from madbg.watchpoints import Watchpoints, WatchpointMonitor, MONITORING_AVAILABLE
+
+
+class State:
+    value = 0
+
+
+def set_value(state):
+    state.value += 1
+
+
+def unrelated():
+    return sum(range(10))
+
+
+def test_only_code_using_watched_names_is_watched():
+    state = State()
+    frame = sys._getframe()
+    watchpoints = Watchpoints()
+    watchpoints.add('state.value', frame, frame.f_locals)
+    assert watchpoints.watches_code(frame.f_code)
+    assert watchpoints.watches_code(set_value.__code__)
+    assert not watchpoints.watches_code(unrelated.__code__)
+
+
+def test_changes_are_detected():
+    items = [1]
+    frame = sys._getframe()
+    watchpoints = Watchpoints()
+    watchpoints.add('items', frame, frame.f_locals)
+    assert not watchpoints.any_changed()
+    items.append(2)
+    assert watchpoints.any_changed()
+    assert watchpoints.update_changed() == ['Watchpoint 1: items\nOld value = [1]\nNew value = [1, 2]']
+    assert not watchpoints.any_changed()
+
+
+@mark.skipif(not MONITORING_AVAILABLE, reason='sys.monitoring is not available')
+def test_monitor_stops_on_change():
+    state = State()
+    frame = sys._getframe()
+    watchpoints = Watchpoints()
+    watchpoints.add('state.value', frame, frame.f_locals)
+    stopped_in = []
+    monitor = WatchpointMonitor(watchpoints, lambda *event: stopped_in.append(event))
+    assert monitor.start(frame)
+    try:
+        unrelated()
+        assert not stopped_in
+        set_value(state)
+    finally:
+        monitor.stop()
+    assert len(stopped_in) == 1
+    frame, event, arg = stopped_in[0]
+    assert frame.f_code is set_value.__code__
+    assert event == 'return'